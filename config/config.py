@@ -63,4 +63,7 @@ PRICE_OUTLIER_STD_THRESHOLD = 2.0
 
 # Models
 SBERT_MODEL = "all-MiniLM-L6-v2"
+SBERT_BACKEND = os.getenv("SBERT_BACKEND", "torch")
+SBERT_TORCH_COMPILE = os.getenv("SBERT_TORCH_COMPILE", "false").lower() == "true"
 SPACY_MODEL = "en_core_web_sm"
+STYLOMETRY_POS_FEATURES = os.getenv("STYLOMETRY_POS_FEATURES", "true").lower() == "true"
@@ -3,9 +3,12 @@ LangGraph Agent Node Functions
 
 Each function represents a node in the agent workflow graph.
 """
+import hashlib
+from functools import lru_cache
 from typing import Dict, Any
+import numpy as np
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from ..state import TenderAnalysisState, RiskSignal
 from ..utils import (
@@ -15,26 +18,131 @@ from ..utils import (
     PriceAnalyzer,
     RelationshipAnalyzer
 )
-from config import OPENAI_MODEL
+from ..utils.cache import read_cached_text, write_cached_text
+from config import (
+    CACHE_DIR,
+    MIN_BIDDERS_FOR_COLLUSION,
+    OPENAI_MODEL,
+    SBERT_BACKEND,
+    SBERT_TORCH_COMPILE,
+    STYLOMETRY_POS_FEATURES
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM
-llm = ChatOpenAI(model=OPENAI_MODEL, temperature=0)
+LLM_CACHE_DIR = CACHE_DIR / "llm"
+
+# Static instructions for the report. Kept identical across calls and sent
+# first so the provider can serve it from its prompt cache; only the tender
+# details in the user message change between requests.
+REPORT_SYSTEM_PROMPT = """You are an expert procurement fraud analyst.
+Analyze the risk signals and provide a clear, actionable summary for procurement officers.
+Focus on explainability and evidence-based reasoning.
+Avoid making definitive accusations - present findings as risk indicators requiring human review.
+
+How to read the risk signals:
+- price_anomaly: statistical irregularities in the bid amounts, such as unusually low
+  variation between bids, clustered high bids (possible cover bidding) or a high share
+  of round-number bids. Low variation alone is weak evidence; it matters more when it
+  coincides with other signals for the same bidders.
+- document_similarity: semantically near-identical documents submitted by different
+  bidders. Shared templates or copied technical sections suggest coordination, but
+  standard forms issued with the tender can also produce high similarity.
+- stylometry: bidders whose documents share a writing style (word length, sentence
+  length, punctuation, part-of-speech profile). This can indicate a common author.
+- relationship_network: groups of bidders linked by shared contact details or similar
+  documents. Cliques and communities of three or more bidders deserve the most attention.
+
+Weigh corroborating evidence: the same bidders appearing in several signal types is
+stronger than a single high score. Scores range from 0 to 1; severity is high, medium
+or low. If no signals were detected, say so plainly and do not speculate.
+
+Provide:
+1. Executive Summary (2-3 sentences)
+2. Key Risk Indicators (prioritized list)
+3. Recommended Actions
+4. Confidence Level"""
+
+
+# LLM and analyzers are created on first use and then reused, so importing
+# this module does not load the SBERT/spaCy models.
+@lru_cache(maxsize=1)
+def get_llm() -> ChatOpenAI:
+    """Return the shared chat model."""
+    return ChatOpenAI(model=OPENAI_MODEL, temperature=0)
 
-# Initialize analyzers (lazy loading could be added)
-semantic_analyzer = SemanticAnalyzer()
-stylometry_analyzer = StylometryAnalyzer()
-price_analyzer = PriceAnalyzer()
-relationship_analyzer = RelationshipAnalyzer()
+
+@lru_cache(maxsize=1)
+def get_semantic_analyzer() -> SemanticAnalyzer:
+    """Return the shared semantic analyzer."""
+    return SemanticAnalyzer(
+        backend=SBERT_BACKEND,
+        compile_model=SBERT_TORCH_COMPILE
+    )
+
+
+@lru_cache(maxsize=1)
+def get_stylometry_analyzer() -> StylometryAnalyzer:
+    """Return the shared stylometry analyzer."""
+    return StylometryAnalyzer(include_pos=STYLOMETRY_POS_FEATURES)
+
+
+@lru_cache(maxsize=1)
+def get_price_analyzer() -> PriceAnalyzer:
+    """Return the shared price analyzer."""
+    return PriceAnalyzer()
+
+
+@lru_cache(maxsize=1)
+def get_relationship_analyzer() -> RelationshipAnalyzer:
+    """Return the shared relationship analyzer."""
+    return RelationshipAnalyzer()
+
+
+def _texts_by_bidder(state: TenderAnalysisState) -> Dict[str, Dict[str, str]]:
+    """
+    Organize extracted texts as {bidder_id: {doc_path: text}}.
+    """
+    arrays = state["bidder_arrays"]
+    extracted_text = state["extracted_text"]
+    return {
+        bidder_id: {
+            doc_path: extracted_text[doc_path]
+            for doc_path in documents
+            if doc_path in extracted_text
+        }
+        for bidder_id, documents in zip(arrays["ids"], arrays["documents"])
+    }
+
+
+def prepare_bidder_arrays_node(state: TenderAnalysisState) -> Dict[str, Any]:
+    """
+    Node 0: Convert the bidder list into column arrays shared by the analysis nodes.
+    """
+    logger.info("[Node: Prepare Bidders] Building bidder arrays")
+    
+    bidders = state["bidders"]
+    return {
+        "bidder_arrays": {
+            "ids": [bidder.bidder_id for bidder in bidders],
+            "amounts": np.fromiter(
+                (bidder.bid_amount for bidder in bidders),
+                dtype=np.float64,
+                count=len(bidders)
+            ),
+            "documents": [bidder.documents for bidder in bidders],
+            "contact_info": [bidder.contact_info for bidder in bidders],
+        },
+        "current_step": "bidder_preparation"
+    }
 
 
 def extract_documents_node(state: TenderAnalysisState) -> Dict[str, Any]:
     """
     Node 1: Extract text from uploaded tender documents.
     """
-    logger.info(f"[Node: Extract Documents] Processing {len(state['uploaded_documents'])} documents")
+    logger.info("[Node: Extract Documents] Processing %d documents", len(state["uploaded_documents"]))
     
     try:
         extracted_text = process_tender_documents(state["uploaded_documents"])
@@ -45,7 +153,7 @@ def extract_documents_node(state: TenderAnalysisState) -> Dict[str, Any]:
             "messages": [HumanMessage(content=f"Extracted text from {len(extracted_text)} documents")]
         }
     except Exception as e:
-        logger.error(f"Error in document extraction: {e}")
+        logger.error("Error in document extraction: %s", e)
         return {
             "error": str(e),
             "current_step": "document_extraction_failed"
@@ -59,14 +167,10 @@ def analyze_prices_node(state: TenderAnalysisState) -> Dict[str, Any]:
     logger.info("[Node: Price Analysis] Analyzing bid prices")
     
     try:
-        # Extract prices from bidders
-        bidder_prices = {
-            bidder.bidder_id: bidder.bid_amount 
-            for bidder in state["bidders"]
-        }
+        arrays = state["bidder_arrays"]
         
         # Run price analysis
-        price_results = price_analyzer.analyze_price_patterns(bidder_prices)
+        price_results = get_price_analyzer().analyze_price_arrays(arrays["ids"], arrays["amounts"])
         
         # Generate risk signals
         risk_signals = []
@@ -77,18 +181,18 @@ def analyze_prices_node(state: TenderAnalysisState) -> Dict[str, Any]:
                 score=price_results["risk_score"],
                 description=f"Price analysis detected {len(price_results['risk_indicators'])} risk indicators",
                 evidence=price_results,
-                affected_bidders=list(bidder_prices.keys())
+                affected_bidders=list(arrays["ids"])
             ))
         
         return {
             "price_analysis": price_results,
-            "risk_signals": state.get("risk_signals", []) + risk_signals,
+            "risk_signals": risk_signals,
             "current_step": "price_analysis",
             "messages": [HumanMessage(content=f"Price analysis complete. Risk score: {price_results['risk_score']:.2f}")]
         }
     
     except Exception as e:
-        logger.error(f"Error in price analysis: {e}")
+        logger.error("Error in price analysis: %s", e)
         return {"error": str(e)}
 
 
@@ -99,16 +203,19 @@ def analyze_similarity_node(state: TenderAnalysisState) -> Dict[str, Any]:
     logger.info("[Node: Similarity Analysis] Analyzing document similarity")
     
     try:
-        # Organize texts by bidder
-        bidder_texts = {}
-        for bidder in state["bidders"]:
-            bidder_texts[bidder.bidder_id] = {}
-            for doc_path in bidder.documents:
-                if doc_path in state["extracted_text"]:
-                    bidder_texts[bidder.bidder_id][doc_path] = state["extracted_text"][doc_path]
+        # Flatten documents so they are encoded in one batch
+        arrays = state["bidder_arrays"]
+        extracted_text = state["extracted_text"]
+        flat_ids = []
+        flat_texts = []
+        for bidder_id, documents in zip(arrays["ids"], arrays["documents"]):
+            for doc_path in documents:
+                if doc_path in extracted_text:
+                    flat_ids.append((bidder_id, doc_path))
+                    flat_texts.append(extracted_text[doc_path])
         
         # Run semantic analysis
-        similarity_results = semantic_analyzer.analyze_bidder_documents(bidder_texts)
+        similarity_results = get_semantic_analyzer().analyze_document_batch(flat_ids, flat_texts)
         
         # Generate risk signals
         risk_signals = []
@@ -120,20 +227,24 @@ def analyze_similarity_node(state: TenderAnalysisState) -> Dict[str, Any]:
                     signal_type="document_similarity",
                     severity="high" if pair["similarity"] > 0.9 else "medium",
                     score=pair["similarity"],
-                    description=f"High similarity detected between {pair['bidder1']} and {pair['bidder2']}",
+                    description=(
+                        f"Identical document submitted by {pair['bidder1']} and {pair['bidder2']}"
+                        if pair.get("exact_match") else
+                        f"High similarity detected between {pair['bidder1']} and {pair['bidder2']}"
+                    ),
                     evidence=pair,
                     affected_bidders=[pair["bidder1"], pair["bidder2"]]
                 ))
         
         return {
             "similarity_analysis": similarity_results,
-            "risk_signals": state.get("risk_signals", []) + risk_signals,
+            "risk_signals": risk_signals,
             "current_step": "similarity_analysis",
             "messages": [HumanMessage(content=f"Found {len(high_risk_pairs)} high-similarity document pairs")]
         }
     
     except Exception as e:
-        logger.error(f"Error in similarity analysis: {e}")
+        logger.error("Error in similarity analysis: %s", e)
         return {"error": str(e)}
 
 
@@ -145,15 +256,10 @@ def analyze_stylometry_node(state: TenderAnalysisState) -> Dict[str, Any]:
     
     try:
         # Organize texts by bidder
-        bidder_texts = {}
-        for bidder in state["bidders"]:
-            bidder_texts[bidder.bidder_id] = {}
-            for doc_path in bidder.documents:
-                if doc_path in state["extracted_text"]:
-                    bidder_texts[bidder.bidder_id][doc_path] = state["extracted_text"][doc_path]
+        bidder_texts = _texts_by_bidder(state)
         
         # Run stylometry analysis
-        stylometry_results = stylometry_analyzer.analyze_bidder_styles(bidder_texts)
+        stylometry_results = get_stylometry_analyzer().analyze_bidder_styles(bidder_texts)
         
         # Generate risk signals
         risk_signals = []
@@ -171,13 +277,13 @@ def analyze_stylometry_node(state: TenderAnalysisState) -> Dict[str, Any]:
         
         return {
             "stylometry_analysis": stylometry_results,
-            "risk_signals": state.get("risk_signals", []) + risk_signals,
+            "risk_signals": risk_signals,
             "current_step": "stylometry_analysis",
             "messages": [HumanMessage(content=f"Stylometry analysis found {len(suspicious_matches)} suspicious matches")]
         }
     
     except Exception as e:
-        logger.error(f"Error in stylometry analysis: {e}")
+        logger.error("Error in stylometry analysis: %s", e)
         return {"error": str(e)}
 
 
@@ -188,20 +294,22 @@ def build_relationship_graph_node(state: TenderAnalysisState) -> Dict[str, Any]:
     logger.info("[Node: Relationship Graph] Building bidder network")
     
     try:
-        # Extract bidder IDs
-        bidder_ids = [bidder.bidder_id for bidder in state["bidders"]]
+        arrays = state["bidder_arrays"]
+        bidder_ids = arrays["ids"]
         
         # Extract contact information
-        contact_data = {}
-        for bidder in state["bidders"]:
-            if bidder.contact_info:
-                contact_data[bidder.bidder_id] = bidder.contact_info
+        contact_data = {
+            bidder_id: contact_info
+            for bidder_id, contact_info in zip(bidder_ids, arrays["contact_info"])
+            if contact_info
+        }
         
         # Build and analyze network
-        graph_results = relationship_analyzer.analyze_bidder_network(
+        graph_results = get_relationship_analyzer().analyze_bidder_network(
             bidders=bidder_ids,
             similarity_data=state.get("similarity_analysis"),
-            contact_data=contact_data
+            contact_data=contact_data,
+            include_graph_data=True  # Rendered by the UI
         )
         
         # Generate risk signals
@@ -220,13 +328,13 @@ def build_relationship_graph_node(state: TenderAnalysisState) -> Dict[str, Any]:
         
         return {
             "relationship_graph": graph_results,
-            "risk_signals": state.get("risk_signals", []) + risk_signals,
+            "risk_signals": risk_signals,
             "current_step": "relationship_graph",
             "messages": [HumanMessage(content=f"Network analysis complete. Found {len(high_risk_groups)} high-risk groups")]
         }
     
     except Exception as e:
-        logger.error(f"Error in relationship graph: {e}")
+        logger.error("Error in relationship graph: %s", e)
         return {"error": str(e)}
 
 
@@ -238,19 +346,14 @@ def generate_report_node(state: TenderAnalysisState) -> Dict[str, Any]:
     
     try:
         # Prepare context for LLM
-        risk_summary = []
-        for signal in state.get("risk_signals", []):
-            risk_summary.append(
-                f"- {signal.signal_type} ({signal.severity}): {signal.description} [Score: {signal.score:.2f}]"
-            )
+        risk_signals = state.get("risk_signals", [])
+        risk_text = "\n".join(
+            f"- {signal.signal_type} ({signal.severity}): {signal.description} [Score: {signal.score:.2f}]"
+            for signal in risk_signals
+        ) or "No significant risks detected."
         
-        risk_text = "\n".join(risk_summary) if risk_summary else "No significant risks detected."
-        
-        # Create prompt
-        system_prompt = """You are an expert procurement fraud analyst. 
-        Analyze the risk signals and provide a clear, actionable summary for procurement officers.
-        Focus on explainability and evidence-based reasoning.
-        Avoid making definitive accusations - present findings as risk indicators requiring human review."""
+        # Create prompt (static instructions first, tender details last)
+        system_prompt = REPORT_SYSTEM_PROMPT
         
         user_prompt = f"""
 Tender ID: {state['tender_id']}
@@ -259,12 +362,6 @@ Number of Bidders: {len(state['bidders'])}
 
 Risk Signals Detected:
 {risk_text}
-
-Provide:
-1. Executive Summary (2-3 sentences)
-2. Key Risk Indicators (prioritized list)
-3. Recommended Actions
-4. Confidence Level
 """
         
         # Generate report
@@ -273,28 +370,49 @@ Provide:
             HumanMessage(content=user_prompt)
         ]
         
-        response = llm.invoke(messages)
-        report_text = response.content
+        # Reuse the report if this exact prompt was already answered
+        cache_key = hashlib.blake2b(
+            "\0".join([OPENAI_MODEL, system_prompt, user_prompt]).encode(),
+            digest_size=16
+        ).hexdigest()
+        cached_report = read_cached_text(LLM_CACHE_DIR, cache_key)
+        
+        if cached_report is not None:
+            logger.info("Using cached report for tender %s", state["tender_id"])
+            response = AIMessage(content=cached_report)
+        else:
+            response = get_llm().invoke(messages)
+            write_cached_text(LLM_CACHE_DIR, cache_key, response.content)
         
         # Calculate overall risk score
-        risk_scores = [signal.score for signal in state.get("risk_signals", [])]
-        overall_risk = max(risk_scores) if risk_scores else 0.0
+        overall_risk = max((signal.score for signal in risk_signals), default=0.0)
         
         return {
             "overall_risk_score": overall_risk,
             "current_step": "report_generation",
             "analysis_complete": True,
-            "messages": state.get("messages", []) + [
+            "messages": [
                 HumanMessage(content="AI Report Generated"),
                 response
             ]
         }
     
     except Exception as e:
-        logger.error(f"Error in report generation: {e}")
+        logger.error("Error in report generation: %s", e)
         return {"error": str(e)}
 
 
+def should_run_collusion(state: TenderAnalysisState) -> str:
+    """
+    Conditional edge function: skip collusion analysis when there are too few bidders.
+    """
+    if len(state["bidders"]) < MIN_BIDDERS_FOR_COLLUSION:
+        logger.info("Fewer than %d bidders; skipping collusion analysis", MIN_BIDDERS_FOR_COLLUSION)
+        return "skip"
+    
+    return "run"
+
+
 def should_continue(state: TenderAnalysisState) -> str:
     """
     Conditional edge function to determine next step or completion.
@@ -3,21 +3,37 @@ LangGraph Workflow Definition
 
 This file defines the state machine workflow using LangGraph.
 """
+from typing import List
 from langgraph.graph import StateGraph, END
 from ..state import TenderAnalysisState
 from .nodes import (
+    prepare_bidder_arrays_node,
     extract_documents_node,
     analyze_prices_node,
     analyze_similarity_node,
     analyze_stylometry_node,
     build_relationship_graph_node,
     generate_report_node,
+    should_run_collusion,
     should_continue
 )
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Independent analyses started in parallel after document extraction
+ANALYSIS_BRANCHES = ["analyze_prices", "analyze_similarity", "analyze_stylometry"]
+
+
+def route_after_extraction(state: TenderAnalysisState) -> List[str]:
+    """
+    Fan out to the analysis branches, or go straight to the report when
+    collusion analysis is not meaningful.
+    """
+    if should_run_collusion(state) == "skip":
+        return ["generate_report"]
+    return ANALYSIS_BRANCHES
+
 
 def create_procurement_agent() -> StateGraph:
     """
@@ -30,6 +46,7 @@ def create_procurement_agent() -> StateGraph:
     workflow = StateGraph(TenderAnalysisState)
     
     # Add nodes to the graph
+    workflow.add_node("prepare_bidders", prepare_bidder_arrays_node)
     workflow.add_node("extract_documents", extract_documents_node)
     workflow.add_node("analyze_prices", analyze_prices_node)
     workflow.add_node("analyze_similarity", analyze_similarity_node)
@@ -38,14 +55,25 @@ def create_procurement_agent() -> StateGraph:
     workflow.add_node("generate_report", generate_report_node)
     
     # Define the workflow edges (execution order)
-    workflow.set_entry_point("extract_documents")
+    workflow.set_entry_point("prepare_bidders")
+    workflow.add_edge("prepare_bidders", "extract_documents")
     
-    # Sequential analysis flow
-    workflow.add_edge("extract_documents", "analyze_prices")
-    workflow.add_edge("analyze_prices", "analyze_similarity")
-    workflow.add_edge("analyze_similarity", "analyze_stylometry")
-    workflow.add_edge("analyze_stylometry", "build_relationship_graph")
-    workflow.add_edge("build_relationship_graph", "generate_report")
+    # Fan out: price, similarity and stylometry analyses are independent.
+    # With too few bidders, skip straight to the report.
+    workflow.add_conditional_edges(
+        "extract_documents",
+        route_after_extraction,
+        ANALYSIS_BRANCHES + ["generate_report"]
+    )
+    
+    # The relationship graph uses the similarity results
+    workflow.add_edge("analyze_similarity", "build_relationship_graph")
+    
+    # Fan in: the report waits for every branch to finish
+    workflow.add_edge(
+        ["analyze_prices", "analyze_stylometry", "build_relationship_graph"],
+        "generate_report"
+    )
     
     # Conditional edge from report generation
     workflow.add_conditional_edges(
@@ -93,6 +121,7 @@ def run_analysis(
         "tender_description": tender_description,
         "bidders": bidders,
         "uploaded_documents": uploaded_documents,
+        "bidder_arrays": None,
         "extracted_text": {},
         "price_analysis": None,
         "similarity_analysis": None,
@@ -107,8 +136,8 @@ def run_analysis(
     }
     
     # Run the workflow
-    logger.info(f"Starting analysis for tender: {tender_id}")
+    logger.info("Starting analysis for tender: %s", tender_id)
     final_state = procurement_agent.invoke(initial_state)
     
-    logger.info(f"Analysis complete. Overall risk score: {final_state.get('overall_risk_score', 0):.2f}")
+    logger.info("Analysis complete. Overall risk score: %.2f", final_state.get("overall_risk_score", 0))
     return final_state
@@ -1,3 +1,3 @@
-from .agent_state import TenderAnalysisState, BidderInfo, RiskSignal
+from .agent_state import TenderAnalysisState, BidderInfo, RiskSignal, AnalysisResult
 
-__all__ = ["TenderAnalysisState", "BidderInfo", "RiskSignal"]
+__all__ = ["TenderAnalysisState", "BidderInfo", "RiskSignal", "AnalysisResult"]
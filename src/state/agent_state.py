@@ -1,12 +1,19 @@
 """
 LangGraph State Definition for Procurement Risk Agent
 """
+import operator
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional, Annotated
 from typing_extensions import TypedDict
 from langgraph.graph import add_messages
 from pydantic import BaseModel, Field
 
 
+def keep_latest(current: Any, update: Any) -> Any:
+    """Reducer for fields that parallel branches may write in the same step."""
+    return update
+
+
 class BidderInfo(BaseModel):
     """Information about a single bidder"""
     bidder_id: str
@@ -27,6 +34,33 @@ class RiskSignal(BaseModel):
     affected_bidders: List[str] = Field(default_factory=list)
 
 
+@dataclass(slots=True, frozen=True)
+class AnalysisResult:
+    """Read-only view of a finished analysis, as rendered by the UI"""
+    overall_risk_score: float = 0.0
+    risk_signals: tuple = ()
+    price_analysis: Optional[Dict[str, Any]] = None
+    similarity_analysis: Optional[Dict[str, Any]] = None
+    stylometry_analysis: Optional[Dict[str, Any]] = None
+    relationship_graph: Optional[Dict[str, Any]] = None
+    messages: tuple = ()
+    error: Optional[str] = None
+    
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "AnalysisResult":
+        """Build from the final TenderAnalysisState returned by run_analysis"""
+        return cls(
+            overall_risk_score=state.get("overall_risk_score", 0.0),
+            risk_signals=tuple(state.get("risk_signals") or ()),
+            price_analysis=state.get("price_analysis"),
+            similarity_analysis=state.get("similarity_analysis"),
+            stylometry_analysis=state.get("stylometry_analysis"),
+            relationship_graph=state.get("relationship_graph"),
+            messages=tuple(state.get("messages") or ()),
+            error=state.get("error")
+        )
+
+
 class TenderAnalysisState(TypedDict):
     """
     State object that flows through the LangGraph agent.
@@ -38,6 +72,9 @@ class TenderAnalysisState(TypedDict):
     bidders: List[BidderInfo]
     uploaded_documents: List[str]
     
+    # Column-wise view of bidders: ids, amounts (float64 array), documents, contact_info
+    bidder_arrays: Optional[Dict[str, Any]]
+    
     # Extracted data
     extracted_text: Dict[str, str]  # document_path -> text
     
@@ -47,14 +84,14 @@ class TenderAnalysisState(TypedDict):
     stylometry_analysis: Optional[Dict[str, Any]]
     relationship_graph: Optional[Dict[str, Any]]
     
-    # Risk signals
-    risk_signals: List[RiskSignal]
+    # Risk signals (each node returns only its new signals; LangGraph concatenates)
+    risk_signals: Annotated[List[RiskSignal], operator.add]
     overall_risk_score: float
     
     # Agent messages and reasoning
     messages: Annotated[List, add_messages]
     
     # Workflow control
-    current_step: str
+    current_step: Annotated[str, keep_latest]
     analysis_complete: bool
-    error: Optional[str]
+    error: Annotated[Optional[str], keep_latest]
@@ -0,0 +1,78 @@
+"""
+Simple file-backed text and array cache
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+def read_cached_text(cache_dir: Path, key: str) -> Optional[str]:
+    """
+    Read a cached text entry.
+    
+    Args:
+        cache_dir: Directory holding the cache entries
+        key: Cache key (used as the file name)
+        
+    Returns:
+        Cached text, or None on a cache miss
+    """
+    try:
+        return (cache_dir / f"{key}.txt").read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def write_cached_text(cache_dir: Path, key: str, text: str) -> None:
+    """
+    Atomically write a text entry to the cache.
+    
+    The text is written to a temporary file and moved into place, so
+    concurrent readers never see a partially written entry.
+    
+    Args:
+        cache_dir: Directory holding the cache entries
+        key: Cache key (used as the file name)
+        text: Text to store
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, cache_dir / f"{key}.txt")
+
+
+def read_cached_array(cache_dir: Path, key: str) -> Optional[np.ndarray]:
+    """
+    Read a cached array entry.
+    
+    Args:
+        cache_dir: Directory holding the cache entries
+        key: Cache key (used as the file name)
+        
+    Returns:
+        Cached array, or None on a cache miss
+    """
+    try:
+        return np.load(cache_dir / f"{key}.npy", allow_pickle=False)
+    except FileNotFoundError:
+        return None
+
+
+def write_cached_array(cache_dir: Path, key: str, array: np.ndarray) -> None:
+    """
+    Atomically write an array entry to the cache.
+    
+    Args:
+        cache_dir: Directory holding the cache entries
+        key: Cache key (used as the file name)
+        array: Array to store
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, cache_dir / f"{key}.npy")
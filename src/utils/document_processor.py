@@ -1,17 +1,124 @@
 """
 Document Processing Utilities
+
+Text extraction uses PDFium and never builds a layout model. Table
+extraction (pdfplumber) is opt-in via extract_tables_from_pdf.
 """
-import pdfplumber
+import pypdfium2 as pdfium
+import functools
+import hashlib
+import io
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 import logging
 
+from config import CACHE_DIR
+from .cache import read_cached_text, write_cached_text
+
 logger = logging.getLogger(__name__)
 
+# Versioned by extractor: text from a different parser (e.g. pdfplumber) differs
+# in whitespace and ordering and must not be served from the cache
+PDF_TEXT_CACHE_DIR = CACHE_DIR / "pdf_text" / "pdfium"
+
+# Shared worker pool for PDF parsing (created on first use). It is process-wide
+# (shared by all Streamlit sessions), so it gets a few cores rather than all.
+MAX_PDF_WORKERS = min(4, os.cpu_count() or 1)
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Return the process pool used for PDF extraction.
+    
+    The pool is created lazily and reused, so Streamlit reruns do not
+    spawn a new set of worker processes on every import. Workers come from a
+    forkserver rather than fork(): forking the multithreaded Streamlit server
+    can copy locks held by other threads and deadlock the children.
+    
+    Returns:
+        Shared ProcessPoolExecutor instance
+    """
+    global _executor
+    if _executor is None:
+        context = multiprocessing.get_context("forkserver")
+        # Import this module once in the fork server instead of in every worker
+        context.set_forkserver_preload([__name__])
+        _executor = ProcessPoolExecutor(max_workers=MAX_PDF_WORKERS, mp_context=context)
+    return _executor
 
+
+def reset_executor():
+    """Discard the shared pool (e.g. after a worker died) so the next call builds a new one."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def file_digest(file_path: str) -> str:
+    """
+    Compute a content hash of a file without reading it into memory.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Hex digest (blake2b, 16 bytes) of the file contents
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.blake2b(b"", digest_size=16).hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.blake2b(mm, digest_size=16).hexdigest()
+
+
+def cache_by_content(cache_dir: Path) -> Callable[[Callable[[str], str]], Callable[[str], str]]:
+    """
+    Cache the text output of a per-file function on disk, keyed by file contents.
+    
+    Args:
+        cache_dir: Directory where cached results are stored
+        
+    Returns:
+        Decorator for functions taking a file path and returning text
+    """
+    def decorator(func: Callable[[str], str]) -> Callable[[str], str]:
+        @functools.wraps(func)
+        def wrapper(file_path: str) -> str:
+            try:
+                key = file_digest(file_path)
+            except OSError:
+                return func(file_path)
+            
+            cached = read_cached_text(cache_dir, key)
+            if cached is not None:
+                logger.debug("Cache hit for %s", Path(file_path).name)
+                return cached
+            
+            text = func(file_path)
+            
+            # Empty output usually means a failed parse; don't persist it
+            if text:
+                write_cached_text(cache_dir, key, text)
+            
+            return text
+        return wrapper
+    return decorator
+
+
+@cache_by_content(PDF_TEXT_CACHE_DIR)
 def extract_text_from_pdf(pdf_path: str) -> str:
     """
-    Extract text from a PDF file using pdfplumber.
+    Extract text from a PDF file using PDFium (via pypdfium2).
+    
+    Only plain page text is returned; use extract_tables_from_pdf when
+    table structure is needed.
     
     Args:
         pdf_path: Path to the PDF file
@@ -20,14 +127,23 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         Extracted text as a single string
     """
     try:
-        text_parts = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
+        buf = io.StringIO()
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                page_text = textpage.get_text_range().replace("\r\n", "\n").strip()
                 if page_text:
-                    text_parts.append(page_text)
+                    if buf.tell():
+                        buf.write("\n\n")
+                    buf.write(page_text)
+                # Release native page resources so only one page is held at a time
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
         
-        full_text = "\n\n".join(text_parts)
+        full_text = buf.getvalue()
         logger.info("Extracted %d characters from %s", len(full_text), Path(pdf_path).name)
         return full_text
     
@@ -40,12 +156,17 @@ def extract_tables_from_pdf(pdf_path: str) -> List[List[List[str]]]:
     """
     Extract tables from a PDF file.
     
+    Not used by process_tender_documents; call it explicitly when table
+    structure is needed, since pdfplumber's layout analysis is expensive.
+    
     Args:
         pdf_path: Path to the PDF file
         
     Returns:
         List of tables, where each table is a list of rows
     """
+    import pdfplumber
+    
     try:
         all_tables = []
         with pdfplumber.open(pdf_path) as pdf:
@@ -64,7 +185,7 @@ def extract_tables_from_pdf(pdf_path: str) -> List[List[List[str]]]:
 
 def process_tender_documents(document_paths: List[str]) -> Dict[str, str]:
     """
-    Process multiple tender documents and extract text.
+    Process multiple tender documents and extract text (tables are not extracted).
     
     Args:
         document_paths: List of paths to document files
@@ -73,15 +194,31 @@ def process_tender_documents(document_paths: List[str]) -> Dict[str, str]:
         Dictionary mapping document path to extracted text
     """
     extracted_texts = {}
+    pdf_paths = []
     
     for doc_path in document_paths:
         path = Path(doc_path)
         
         if path.suffix.lower() == '.pdf':
-            text = extract_text_from_pdf(doc_path)
-            extracted_texts[doc_path] = text
+            pdf_paths.append(doc_path)
+            extracted_texts[doc_path] = ""
         else:
             logger.warning("Unsupported file format: %s", path.suffix)
             extracted_texts[doc_path] = ""
     
+    # Parse PDFs in parallel; a single file is not worth the IPC overhead
+    if len(pdf_paths) > 1:
+        try:
+            texts = list(get_executor().map(extract_text_from_pdf, pdf_paths, chunksize=1))
+        except BrokenProcessPool as exc:
+            # A worker died (e.g. OOM-killed); the pool is unusable from now on
+            logger.warning("PDF worker pool broke (%s); extracting serially", exc)
+            reset_executor()
+            texts = map(extract_text_from_pdf, pdf_paths)
+    else:
+        texts = map(extract_text_from_pdf, pdf_paths)
+    
+    for doc_path, text in zip(pdf_paths, texts):
+        extracted_texts[doc_path] = text
+    
     return extracted_texts
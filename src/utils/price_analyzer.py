@@ -1,13 +1,24 @@
 """
 Price Analysis and Statistical Anomaly Detection
 """
+import math
 import numpy as np
-from scipy import stats
-from typing import List, Dict
+from typing import List, Dict, Sequence
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Below this many bids, plain Python is faster than numpy's per-call overhead
+SMALL_SAMPLE_SIZE = 16
+
+
+def _interpolated_quantile(ordered: List[float], q: float) -> float:
+    """Linear-interpolation quantile of a sorted list (matches np.percentile)."""
+    position = q * (len(ordered) - 1)
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (position - lower) * (ordered[upper] - ordered[lower])
+
 
 class PriceAnalyzer:
     """Analyzes bid prices for anomalies and suspicious patterns"""
@@ -34,35 +45,67 @@ class PriceAnalyzer:
         if len(prices) < 3:
             return {"error": "Need at least 3 bids for statistical analysis"}
         
-        prices_array = np.array(prices)
-        mean_price = np.mean(prices_array)
-        std_price = np.std(prices_array)
-        median_price = np.median(prices_array)
-        
-        # Z-score outliers
-        z_scores = np.abs(stats.zscore(prices_array))
-        outliers = z_scores > self.outlier_threshold
-        
-        # IQR method
-        q1 = np.percentile(prices_array, 25)
-        q3 = np.percentile(prices_array, 75)
-        iqr = q3 - q1
-        lower_bound = q1 - (1.5 * iqr)
-        upper_bound = q3 + (1.5 * iqr)
-        
-        iqr_outliers = (prices_array < lower_bound) | (prices_array > upper_bound)
+        if len(prices) < SMALL_SAMPLE_SIZE:
+            values = np.asarray(prices, dtype=np.float64).tolist()
+            n = len(values)
+            mean_price = math.fsum(values) / n
+            std_price = math.sqrt(math.fsum((p - mean_price) ** 2 for p in values) / n)
+            
+            ordered = sorted(values)
+            q1, median_price, q3 = (_interpolated_quantile(ordered, q) for q in (0.25, 0.5, 0.75))
+            min_price = ordered[0]
+            max_price = ordered[-1]
+            
+            iqr = q3 - q1
+            lower_bound = q1 - (1.5 * iqr)
+            upper_bound = q3 + (1.5 * iqr)
+            
+            outliers = [
+                std_price > 0 and abs(p - mean_price) / std_price > self.outlier_threshold
+                for p in values
+            ]
+            iqr_outliers = [p < lower_bound or p > upper_bound for p in values]
+        else:
+            prices_array = np.asarray(prices, dtype=np.float64)
+            n = prices_array.size
+            mean_price = prices_array.mean()
+            std_price = prices_array.std()
+            
+            # Order statistics in one partition pass: min, max and the two
+            # neighbours of each interpolated quantile (same as np.percentile)
+            positions = np.array([0.25, 0.5, 0.75]) * (n - 1)
+            lower = np.floor(positions).astype(np.intp)
+            upper = np.ceil(positions).astype(np.intp)
+            partitioned = np.partition(prices_array, np.unique(np.r_[0, n - 1, lower, upper]))
+            q1, median_price, q3 = partitioned[lower] + (positions - lower) * (partitioned[upper] - partitioned[lower])
+            min_price = partitioned[0]
+            max_price = partitioned[n - 1]
+            
+            # Z-score outliers
+            if std_price > 0:
+                z_scores = np.abs((prices_array - mean_price) / std_price)
+            else:
+                z_scores = np.zeros(n)
+            outliers = (z_scores > self.outlier_threshold).tolist()
+            
+            # IQR method
+            iqr = q3 - q1
+            lower_bound = q1 - (1.5 * iqr)
+            upper_bound = q3 + (1.5 * iqr)
+            
+            iqr_outliers = ((prices_array < lower_bound) | (prices_array > upper_bound)).tolist()
         
         return {
             "mean": float(mean_price),
             "median": float(median_price),
             "std_dev": float(std_price),
             "coefficient_variation": float(std_price / mean_price) if mean_price > 0 else 0,
-            "z_score_outliers": outliers.tolist(),
-            "iqr_outliers": iqr_outliers.tolist(),
+            "z_score_outliers": outliers,
+            "iqr_outliers": iqr_outliers,
             "price_range": {
-                "min": float(np.min(prices_array)),
-                "max": float(np.max(prices_array)),
-                "range": float(np.max(prices_array) - np.min(prices_array))
+                "min": float(min_price),
+                "max": float(max_price),
+                "range": float(max_price - min_price)
             }
         }
     
@@ -81,43 +124,72 @@ class PriceAnalyzer:
         Returns:
             Cover bidding analysis results
         """
-        prices = list(bidder_prices.values())
-        bidder_ids = list(bidder_prices.keys())
+        return self.detect_cover_bidding_arrays(
+            list(bidder_prices.keys()),
+            np.fromiter(bidder_prices.values(), dtype=np.float64, count=len(bidder_prices)),
+            margin_threshold
+        )
+    
+    def detect_cover_bidding_arrays(
+        self,
+        bidder_ids: Sequence[str],
+        prices: np.ndarray,
+        margin_threshold: float = 0.05
+    ) -> Dict[str, any]:
+        """
+        Detect potential cover bidding from parallel ID/amount arrays.
         
+        Args:
+            bidder_ids: Bidder IDs, aligned with prices
+            prices: Bid amounts (float64 array)
+            margin_threshold: Threshold for detecting clustered pricing
+            
+        Returns:
+            Cover bidding analysis results
+        """
         if len(prices) < 2:
             return {"suspicious_patterns": []}
         
         # Sort prices
-        sorted_indices = np.argsort(prices)
-        sorted_prices = [prices[i] for i in sorted_indices]
-        sorted_bidders = [bidder_ids[i] for i in sorted_indices]
+        prices_array = np.asarray(prices, dtype=np.float64)
+        sorted_indices = np.argsort(prices_array)
+        sorted_prices = prices_array[sorted_indices]
+        n = sorted_prices.size
         
         # Look for suspiciously high bids (far from winning bid)
         lowest_bid = sorted_prices[0]
-        suspicious_bids = []
+        high_bids = np.flatnonzero((sorted_prices - lowest_bid) / lowest_bid > 0.15)
         
-        for i in range(1, len(sorted_prices)):
-            price_gap = (sorted_prices[i] - lowest_bid) / lowest_bid
-            
-            # If a bid is significantly higher but close to another bid, it's suspicious
-            if price_gap > 0.15:  # More than 15% higher than lowest
-                # Check if it's close to another bid (potential coordination)
-                for j in range(i + 1, len(sorted_prices)):
-                    relative_diff = abs(sorted_prices[j] - sorted_prices[i]) / sorted_prices[i]
-                    
-                    if relative_diff < margin_threshold:
-                        suspicious_bids.append({
-                            "bidder1": sorted_bidders[i],
-                            "bidder2": sorted_bidders[j],
-                            "price1": sorted_prices[i],
-                            "price2": sorted_prices[j],
-                            "difference_pct": relative_diff * 100,
-                            "pattern": "clustered_high_bids"
-                        })
+        # Prices are sorted, so the bids close to a high bid form a contiguous
+        # window after it. One extra slot absorbs rounding; the exact test follows.
+        window_ends = np.searchsorted(sorted_prices, sorted_prices[high_bids] * (1 + margin_threshold), side="right")
+        counts = np.minimum(window_ends + 1, n) - (high_bids + 1)
+        first = np.repeat(high_bids, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = first + 1 + offsets
+        
+        relative_diff = np.abs(sorted_prices[second] - sorted_prices[first]) / sorted_prices[first]
+        clustered = relative_diff < margin_threshold
+        
+        suspicious_bids = [
+            {
+                "bidder1": bidder_ids[sorted_indices[i]],
+                "bidder2": bidder_ids[sorted_indices[j]],
+                "price1": float(prices_array[sorted_indices[i]]),
+                "price2": float(prices_array[sorted_indices[j]]),
+                "difference_pct": diff * 100,
+                "pattern": "clustered_high_bids"
+            }
+            for i, j, diff in zip(
+                first[clustered].tolist(),
+                second[clustered].tolist(),
+                relative_diff[clustered].tolist()
+            )
+        ]
         
         return {
-            "lowest_bid": lowest_bid,
-            "highest_bid": sorted_prices[-1],
+            "lowest_bid": float(lowest_bid),
+            "highest_bid": float(sorted_prices[-1]),
             "suspicious_patterns": suspicious_bids
         }
     
@@ -134,15 +206,36 @@ class PriceAnalyzer:
         Returns:
             Complete price analysis
         """
-        prices = list(bidder_prices.values())
+        return self.analyze_price_arrays(
+            list(bidder_prices.keys()),
+            np.fromiter(bidder_prices.values(), dtype=np.float64, count=len(bidder_prices))
+        )
+    
+    def analyze_price_arrays(
+        self,
+        bidder_ids: Sequence[str],
+        prices: np.ndarray
+    ) -> Dict[str, any]:
+        """
+        Comprehensive price pattern analysis on parallel ID/amount arrays.
+        
+        Args:
+            bidder_ids: Bidder IDs, aligned with prices
+            prices: Bid amounts (float64 array)
+            
+        Returns:
+            Complete price analysis
+        """
+        prices_array = np.asarray(prices, dtype=np.float64)
         
         # Run all analyses
-        outlier_results = self.detect_outliers(prices)
-        cover_bid_results = self.detect_cover_bidding(bidder_prices)
+        outlier_results = self.detect_outliers(prices_array)
+        cover_bid_results = self.detect_cover_bidding_arrays(bidder_ids, prices_array)
         
-        # Check for round number clustering (sign of price coordination)
-        round_numbers = sum(1 for p in prices if p % 1000 == 0 or p % 500 == 0)
-        round_number_ratio = round_numbers / len(prices) if prices else 0
+        # Check for round number clustering (sign of price coordination);
+        # multiples of 1000 are also multiples of 500
+        round_numbers = int(np.count_nonzero(np.mod(prices_array, 500) == 0))
+        round_number_ratio = round_numbers / prices_array.size if prices_array.size else 0
         
         # Calculate risk score
         risk_indicators = []
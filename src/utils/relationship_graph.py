@@ -2,18 +2,49 @@
 Relationship Graph Analysis using NetworkX
 """
 import networkx as nx
-from typing import Dict, List, Set
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
 import logging
 
+# igraph (C core) is optional; without it the NetworkX/bitset code is used
+try:
+    import igraph
+    IGRAPH_AVAILABLE = True
+except ImportError:
+    IGRAPH_AVAILABLE = False
+    igraph = None
+
 logger = logging.getLogger(__name__)
 
+# Louvain runs per detection; the partition with the best modularity is kept
+LOUVAIN_SEEDS = (0, 1, 2)
+
+# Number of distinct graphs whose analysis results are memoized
+ANALYSIS_CACHE_SIZE = 8
+
+# Above this many nodes fall back to NetworkX's set-based clique search
+BITSET_CLIQUE_MAX_NODES = 65536
+
+
+def _bit_indices(bits: int) -> Iterator[int]:
+    """Yield the positions of the set bits of a non-negative int."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
 
 class RelationshipAnalyzer:
     """Analyzes relationships between bidders using graph analysis"""
     
     def __init__(self):
         """Initialize the relationship analyzer"""
+        # Nodes are small ints; _name_of/_id_of map them to bidder IDs
         self.graph = nx.Graph()
+        self._id_of: Dict[str, int] = {}
+        self._name_of: List[str] = []
+        self._analysis_cache: "OrderedDict[Hashable, Tuple]" = OrderedDict()
+        self._igraph_view = None
     
     def add_bidder(self, bidder_id: str, metadata: Dict = None):
         """
@@ -23,7 +54,21 @@ class RelationshipAnalyzer:
             bidder_id: Unique bidder identifier
             metadata: Additional bidder information
         """
-        self.graph.add_node(bidder_id, **(metadata or {}))
+        self.graph.add_node(self._intern(bidder_id), **(metadata or {}))
+    
+    def _intern(self, bidder_id: str) -> int:
+        """Return the graph node ID for a bidder, assigning the next one if new."""
+        node = self._id_of.get(bidder_id)
+        if node is None:
+            node = self._id_of[bidder_id] = len(self._name_of)
+            self._name_of.append(bidder_id)
+        return node
+    
+    def clear(self):
+        """Remove all bidders and relationships."""
+        self.graph.clear()
+        self._id_of.clear()
+        self._name_of.clear()
     
     def add_relationship(
         self, 
@@ -43,17 +88,19 @@ class RelationshipAnalyzer:
             weight: Strength of the relationship (0-1)
             evidence: Supporting evidence for the relationship
         """
-        if self.graph.has_edge(bidder1, bidder2):
+        node1 = self._intern(bidder1)
+        node2 = self._intern(bidder2)
+        if self.graph.has_edge(node1, node2):
             # Update existing edge
-            edge_data = self.graph[bidder1][bidder2]
+            edge_data = self.graph[node1][node2]
             edge_data['weight'] = max(edge_data.get('weight', 0), weight)
             edge_data['relationships'] = edge_data.get('relationships', [])
             edge_data['relationships'].append(relationship_type)
         else:
             # Create new edge
             self.graph.add_edge(
-                bidder1, 
-                bidder2, 
+                node1, 
+                node2, 
                 weight=weight,
                 relationships=[relationship_type],
                 evidence=evidence or {}
@@ -66,13 +113,28 @@ class RelationshipAnalyzer:
         Returns:
             List of bidder communities
         """
+        return [self._names(c, set) for c in self._detect_communities()]
+    
+    def _detect_communities(self) -> List[Set[int]]:
+        """Louvain communities of more than one node, as graph node IDs."""
         if len(self.graph.nodes) < 2:
             return []
         
-        # Use Louvain community detection
-        from networkx.algorithms import community
+        # Use Louvain community detection (near-linear in the number of edges).
+        # A few seeded runs, keeping the highest weighted modularity, give
+        # stabler groups than a single run and stay reproducible.
+        from networkx.algorithms.community import louvain_communities, modularity
+        
+        # Without (weighted) edges every bidder is its own community, and
+        # modularity is undefined
+        if self.graph.size(weight="weight") <= 0:
+            return []
         
-        communities = community.greedy_modularity_communities(self.graph)
+        partitions = [
+            louvain_communities(self.graph, weight="weight", seed=seed)
+            for seed in LOUVAIN_SEEDS
+        ]
+        communities = max(partitions, key=lambda p: modularity(self.graph, p, weight="weight"))
         return [set(c) for c in communities if len(c) > 1]
     
     def find_suspicious_cliques(self, min_size: int = 3) -> List[List[str]]:
@@ -85,12 +147,83 @@ class RelationshipAnalyzer:
         Returns:
             List of suspicious cliques
         """
-        cliques = list(nx.find_cliques(self.graph))
-        suspicious = [clique for clique in cliques if len(clique) >= min_size]
+        return [self._names(clique) for clique in self._find_suspicious_cliques(min_size)]
+    
+    def _find_suspicious_cliques(self, min_size: int) -> List[List[int]]:
+        """Maximal cliques of at least min_size nodes, as graph node IDs."""
+        if IGRAPH_AVAILABLE:
+            g = self._to_igraph()
+            nodes = g.vs["name"] if g.vcount() else []
+            suspicious = [[nodes[i] for i in clique] for clique in g.maximal_cliques(min=min_size)]
+        elif len(self.graph) <= BITSET_CLIQUE_MAX_NODES:
+            suspicious = self._find_cliques_bitset(min_size)
+        else:
+            cliques = list(nx.find_cliques(self.graph))
+            suspicious = [clique for clique in cliques if len(clique) >= min_size]
         
         logger.info("Found %d cliques of size >= %d", len(suspicious), min_size)
         return suspicious
     
+    def _find_cliques_bitset(self, min_size: int) -> List[List[int]]:
+        """
+        Enumerate maximal cliques of at least min_size nodes.
+        
+        Bron-Kerbosch with pivoting, where the candidate, excluded and
+        neighbourhood sets are int bitmasks, so set operations are single
+        integer ops. Branches that cannot reach min_size are pruned.
+        
+        Args:
+            min_size: Minimum clique size to report
+            
+        Returns:
+            List of maximal cliques (lists of graph node IDs)
+        """
+        nodes = list(self.graph.nodes())
+        if not nodes:
+            return []
+        
+        index = {node: i for i, node in enumerate(nodes)}
+        adjacency = [0] * len(nodes)
+        for u, v in self.graph.edges():
+            if u != v:
+                adjacency[index[u]] |= 1 << index[v]
+                adjacency[index[v]] |= 1 << index[u]
+        
+        cliques = []
+        
+        def expand(clique: int, size: int, candidates: int, excluded: int):
+            if not candidates:
+                if not excluded and size >= min_size:
+                    cliques.append(clique)
+                return
+            if size + candidates.bit_count() < min_size:
+                return
+            
+            # Pivot on the vertex covering the most candidates
+            best = -1
+            pivot_neighbours = 0
+            remaining = candidates | excluded
+            while remaining:
+                bit = remaining & -remaining
+                remaining ^= bit
+                neighbours = adjacency[bit.bit_length() - 1]
+                covered = (neighbours & candidates).bit_count()
+                if covered > best:
+                    best = covered
+                    pivot_neighbours = neighbours
+            
+            remaining = candidates & ~pivot_neighbours
+            while remaining:
+                bit = remaining & -remaining
+                remaining ^= bit
+                neighbours = adjacency[bit.bit_length() - 1]
+                expand(clique | bit, size + 1, candidates & neighbours, excluded & neighbours)
+                candidates ^= bit
+                excluded |= bit
+        
+        expand(0, 0, (1 << len(nodes)) - 1, 0)
+        return [[nodes[i] for i in _bit_indices(clique)] for clique in cliques]
+    
     def calculate_centrality_scores(self) -> Dict[str, float]:
         """
         Calculate centrality scores for each bidder.
@@ -99,18 +232,48 @@ class RelationshipAnalyzer:
         Returns:
             Dictionary mapping bidder IDs to centrality scores
         """
+        name_of = self._name_of
+        return {name_of[node]: score for node, score in self._calculate_centrality_scores().items()}
+    
+    def _calculate_centrality_scores(self) -> Dict[int, float]:
+        """Degree centrality keyed by graph node ID."""
         if len(self.graph.nodes) == 0:
             return {}
         
         # Degree centrality (number of connections)
+        if IGRAPH_AVAILABLE and len(self.graph.nodes) > 1:
+            g = self._to_igraph()
+            scale = 1.0 / (g.vcount() - 1)
+            return {name: degree * scale for name, degree in zip(g.vs["name"], g.degree())}
+        
         centrality = nx.degree_centrality(self.graph)
         return centrality
     
+    def _to_igraph(self) -> "igraph.Graph":
+        """
+        Compact igraph copy of the current graph for the analysis phase.
+        
+        The NetworkX graph stays the ingestion surface; the igraph view is
+        rebuilt only when the graph's nodes or edges change.
+        
+        Returns:
+            igraph.Graph with vertex attribute "name" holding the graph node ID
+        """
+        key = self._graph_fingerprint()
+        if self._igraph_view is None or self._igraph_view[0] != key:
+            nodes, edges = key
+            index = {node: i for i, node in enumerate(nodes)}
+            g = igraph.Graph(n=len(nodes), edges=[(index[u], index[v]) for u, v, _ in edges])
+            g.vs["name"] = list(nodes)
+            self._igraph_view = (key, g)
+        return self._igraph_view[1]
+    
     def analyze_bidder_network(
         self, 
         bidders: List[str],
         similarity_data: Dict = None,
-        contact_data: Dict = None
+        contact_data: Dict = None,
+        include_graph_data: bool = False
     ) -> Dict[str, any]:
         """
         Build and analyze the complete bidder relationship network.
@@ -119,12 +282,14 @@ class RelationshipAnalyzer:
             bidders: List of bidder IDs
             similarity_data: Document similarity information
             contact_data: Contact information for detecting shared addresses/phones
+            include_graph_data: Also export the graph in node-link format (for
+                visualization); otherwise use get_graph_for_visualization()
             
         Returns:
             Network analysis results
         """
         # Clear previous graph
-        self.graph.clear()
+        self.clear()
         
         # Add all bidders
         for bidder in bidders:
@@ -142,32 +307,53 @@ class RelationshipAnalyzer:
                 )
         
         # Add relationships based on shared contact info
+        shared_contact_groups = {}
         if contact_data:
+            # Imported here so loading this module (and the UI) doesn't pull in pandas
+            import pandas as pd
+            
+            # One row per bidder, in contact_data order
+            contacts = pd.DataFrame.from_records(list(contact_data.values()), index=list(contact_data.keys()))
+            
             # Group by email, phone, address
             for field in ["email", "phone", "address"]:
-                field_groups = {}
-                for bidder_id, info in contact_data.items():
-                    value = info.get(field)
-                    if value:
-                        field_groups.setdefault(value, []).append(bidder_id)
+                if field not in contacts:
+                    continue
+                values = contacts[field]
+                values = values[values.notna()]
+                values = values[values.astype(bool)]
                 
-                # Create edges for shared values
-                for value, bidder_list in field_groups.items():
-                    if len(bidder_list) > 1:
-                        for i in range(len(bidder_list)):
-                            for j in range(i + 1, len(bidder_list)):
-                                self.add_relationship(
-                                    bidder_list[i],
-                                    bidder_list[j],
-                                    f"shared_{field}",
-                                    weight=0.8,
-                                    evidence={field: value}
-                                )
-        
-        # Analyze the network
-        communities = self.detect_communities()
-        cliques = self.find_suspicious_cliques()
-        centrality = self.calculate_centrality_scores()
+                # Only values held by more than one bidder form groups
+                shared = values[values.duplicated(keep=False)]
+                
+                # Link each group as a star around its first bidder: K-1 edges
+                # instead of K(K-1)/2, keeping the group connected
+                for value, members in shared.groupby(shared, sort=False):
+                    bidder_list = members.index.tolist()
+                    representative = bidder_list[0]
+                    for bidder in bidder_list[1:]:
+                        self.add_relationship(
+                            representative,
+                            bidder,
+                            f"shared_{field}",
+                            weight=0.8,
+                            evidence={field: value}
+                        )
+                    
+                    # The full cohort is recorded directly rather than
+                    # rediscovered as a clique
+                    group = shared_contact_groups.setdefault(
+                        frozenset(bidder_list),
+                        {"bidders": bidder_list, "shared_fields": []}
+                    )
+                    group["shared_fields"].append(field)
+        
+        # Analyze the network (in node IDs), then map back to bidder IDs
+        communities, cliques, centrality = self._analyze_structure()
+        name_of = self._name_of
+        communities = [self._names(c, set) for c in communities]
+        cliques = [self._names(clique) for clique in cliques]
+        centrality = {name_of[node]: score for node, score in centrality.items()}
         
         # Calculate overall network metrics
         num_edges = self.graph.number_of_edges()
@@ -191,7 +377,26 @@ class RelationshipAnalyzer:
                 "type": "clique"
             })
         
-        return {
+        # A shared-contact cohort already reported as a community or clique is
+        # merged into that entry rather than listed twice
+        groups_by_members = {}
+        for group in high_risk_groups:
+            groups_by_members.setdefault(frozenset(group["bidders"]), group)
+        
+        for members, group in shared_contact_groups.items():
+            if len(group["bidders"]) >= 3:
+                existing = groups_by_members.get(members)
+                if existing is not None:
+                    existing["shared_fields"] = group["shared_fields"]
+                    continue
+                high_risk_groups.append({
+                    "bidders": group["bidders"],
+                    "size": len(group["bidders"]),
+                    "type": "shared contact",
+                    "shared_fields": group["shared_fields"]
+                })
+        
+        results = {
             "num_bidders": num_nodes,
             "num_relationships": num_edges,
             "network_density": density,
@@ -199,14 +404,58 @@ class RelationshipAnalyzer:
             "suspicious_cliques": cliques,
             "centrality_scores": centrality,
             "high_risk_groups": high_risk_groups,
-            "graph_data": nx.node_link_data(self.graph)  # For visualization
+            "shared_contact_groups": list(shared_contact_groups.values())
         }
+        
+        if include_graph_data:
+            results["graph_data"] = self.get_graph_for_visualization()  # For visualization
+        
+        return results
+    
+    def _graph_fingerprint(self) -> Hashable:
+        """Key identifying the graph's nodes and weighted edges, in insertion order."""
+        return (tuple(self.graph.nodes()), tuple(self.graph.edges(data="weight")))
+    
+    def _analyze_structure(self) -> Tuple[List[Set[int]], List[List[int]], Dict[int, float]]:
+        """
+        Run community, clique and centrality analysis, memoized by graph.
+        
+        The key covers nodes, edges and edge weights (community detection is
+        weighted), so only an identical network, e.g. re-running the same
+        tender, reuses earlier results.
+        
+        Returns:
+            (communities, cliques, centrality) for the current graph
+        """
+        key = self._graph_fingerprint()
+        cached = self._analysis_cache.get(key)
+        if cached is None:
+            cached = (
+                self._detect_communities(),
+                self._find_suspicious_cliques(3),
+                self._calculate_centrality_scores()
+            )
+            self._analysis_cache[key] = cached
+            if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+        else:
+            self._analysis_cache.move_to_end(key)
+            logger.info("Reusing network analysis for unchanged graph")
+        
+        # Hand out copies so callers cannot alter the cached results
+        communities, cliques, centrality = cached
+        return [set(c) for c in communities], [list(c) for c in cliques], dict(centrality)
     
     def get_graph_for_visualization(self) -> Dict:
         """
         Export graph data in a format suitable for visualization.
         
         Returns:
-            Graph data in node-link format
+            Graph data in node-link format, with bidder IDs as node IDs
         """
-        return nx.node_link_data(self.graph)
+        return nx.node_link_data(nx.relabel_nodes(self.graph, self._name_of.__getitem__))
+    
+    def _names(self, nodes, container=list):
+        """Map graph node IDs back to bidder IDs."""
+        name_of = self._name_of
+        return container(name_of[node] for node in nodes)
@@ -1,26 +1,149 @@
 """
 Semantic Similarity Analysis using Sentence Transformers
 """
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
+import hashlib
 import numpy as np
-from typing import List, Dict, Tuple
+import torch
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 import logging
 
+from config import CACHE_DIR
+from .cache import read_cached_array, write_cached_array
+from .text_dedup import deduplicate_texts
+
+# FAISS is optional; without it similar pairs always come from the exact matrix
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+    faiss = None
+
 logger = logging.getLogger(__name__)
 
+# Corpus size from which similar pairs are found with an HNSW index instead of
+# the full N x N matrix, and how many neighbours each document retrieves
+ANN_MIN_DOCUMENTS = 500
+ANN_NEIGHBOURS = 20
+
+# Embeddings are cached per model, keyed by sha256 of the text
+EMBEDDING_CACHE_DIR = CACHE_DIR / "embeddings"
+
 
 class SemanticAnalyzer:
     """Analyzes semantic similarity between documents"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        device: Optional[str] = None,
+        cache_dir: Optional[Path] = EMBEDDING_CACHE_DIR,
+        backend: str = "torch",
+        compile_model: bool = False
+    ):
         """
         Initialize the semantic analyzer.
         
         Args:
             model_name: Name of the sentence transformer model
+            device: Torch device for encoding (defaults to CUDA when available)
+            cache_dir: Root of the on-disk embedding cache (None disables it)
+            backend: Inference backend: "torch", or "onnx"/"openvino" to run the
+                transformer on an optimized runtime (needs the matching
+                sentence-transformers extra)
+            compile_model: With the torch backend, compile the transformer with
+                torch.compile (slow first call, faster afterwards)
+        """
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        logger.info("Loading semantic model: %s on %s (%s backend)", model_name, self.device, backend)
+        self.model = SentenceTransformer(model_name, device=self.device, backend=backend)
+        if backend == "torch":
+            if self.device.startswith("cuda"):
+                # FP16 weights halve memory traffic and use tensor cores
+                self.model.half()
+            if compile_model:
+                self._compile_transformer()
+        self.cache_dir = cache_dir / model_name.replace("/", "__") if cache_dir is not None else None
+    
+    def _compile_transformer(self):
+        """Compile the transformer body in place; tokenization stays in Python."""
+        transformer = self.model[0]
+        try:
+            # Batches are padded to varying lengths, so compile for dynamic shapes
+            transformer.auto_model = torch.compile(transformer.auto_model, dynamic=True)
+        except Exception as e:
+            logger.warning("torch.compile unavailable, using eager mode: %s", e)
+    
+    def encode_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
         """
-        logger.info("Loading semantic model: %s", model_name)
-        self.model = SentenceTransformer(model_name)
+        Encode texts into L2-normalized embeddings with a single batched call.
+        
+        Args:
+            texts: List of text documents
+            batch_size: Number of texts per forward pass
+            
+        Returns:
+            Embedding matrix (N x dim numpy array), one row per input text
+        """
+        # Encode each distinct text once (bidders often share boilerplate)
+        unique_texts, inverse = deduplicate_texts(texts)
+        
+        if self.cache_dir is None or not unique_texts:
+            embeddings = self._encode(unique_texts, batch_size)
+        else:
+            embeddings = self._encode_cached(unique_texts, batch_size)
+        
+        # Expand back to one row per input text
+        if len(unique_texts) < len(texts):
+            embeddings = embeddings[inverse]
+        
+        return embeddings
+    
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Run the model on texts, returning float32 unit-length rows."""
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            device=self.device
+        )
+        
+        # Similarities are always computed in float32 on the host
+        return embeddings.astype(np.float32, copy=False)
+    
+    def _encode_cached(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """
+        Encode texts, reusing embeddings cached on disk.
+        
+        Only texts without a cache entry are run through the model. Entries
+        are stored as float16 and re-normalized on load; fresh embeddings go
+        through the same rounding so cold and warm runs agree.
+        
+        Args:
+            texts: List of distinct text documents
+            batch_size: Number of texts per forward pass
+            
+        Returns:
+            Embedding matrix (N x dim numpy array)
+        """
+        keys = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+        rows = [read_cached_array(self.cache_dir, key) for key in keys]
+        misses = [i for i, row in enumerate(rows) if row is None]
+        
+        if misses:
+            logger.info("Encoding %d of %d texts (rest cached)", len(misses), len(texts))
+            fresh = self._encode([texts[i] for i in misses], batch_size).astype(np.float16)
+            for i, row in zip(misses, fresh):
+                write_cached_array(self.cache_dir, keys[i], row)
+                rows[i] = row
+        
+        embeddings = np.stack(rows).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
     
     def compute_similarity_matrix(self, texts: List[str]) -> np.ndarray:
         """
@@ -36,12 +159,103 @@ class SemanticAnalyzer:
             return np.array([])
         
         # Generate embeddings
-        embeddings = self.model.encode(texts, convert_to_tensor=True)
+        return self._similarity_from_embeddings(self.encode_batch(texts))
+    
+    def _similarity_from_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """Pairwise cosine similarity of L2-normalized embedding rows."""
+        # Embeddings are L2-normalized, so one matrix product gives all cosine similarities
+        return embeddings @ embeddings.T
+    
+    def _find_similar_pairs(
+        self,
+        texts: List[str],
+        threshold: float
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Find index pairs of texts whose similarity reaches the threshold.
+        
+        Args:
+            texts: List of text documents
+            threshold: Similarity threshold (0 to 1)
+            
+        Returns:
+            List of (i, j, similarity_score) tuples with i < j, most similar first
+        """
+        if len(texts) < 2:
+            return []
+        
+        return self._similar_pairs_from_embeddings(self.encode_batch(texts), threshold)
+    
+    def _similar_pairs_from_embeddings(
+        self,
+        embeddings: np.ndarray,
+        threshold: float
+    ) -> List[Tuple[int, int, float]]:
+        """Similar index pairs of embedding rows, using ANN search for large corpora."""
+        if FAISS_AVAILABLE and len(embeddings) >= ANN_MIN_DOCUMENTS:
+            return self._ann_pairs_above_threshold(embeddings, threshold)
+        
+        return self._pairs_above_threshold(self._similarity_from_embeddings(embeddings), threshold)
+    
+    def _ann_pairs_above_threshold(
+        self,
+        embeddings: np.ndarray,
+        threshold: float
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Approximate similar pairs via an HNSW inner-product index.
+        
+        Each document only retrieves its ANN_NEIGHBOURS nearest neighbours, so
+        this is O(N * k) instead of O(N^2); a document with more neighbours
+        above the threshold than that reports only the closest ones.
+        
+        Args:
+            embeddings: L2-normalized embedding matrix
+            threshold: Similarity threshold (0 to 1)
+            
+        Returns:
+            List of (i, j, similarity_score) tuples with i < j, most similar first
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        index = faiss.IndexHNSWFlat(vectors.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 40
+        index.add(vectors)
+        
+        k = min(ANN_NEIGHBOURS + 1, len(vectors))
+        scores, neighbours = index.search(vectors, k)
+        
+        # Keep hits above threshold (faiss pads missing results with -1), then
+        # fold symmetric hits onto i < j
+        queries = np.repeat(np.arange(len(vectors)), k)
+        neighbours = neighbours.ravel()
+        hits = (scores.ravel() >= threshold) & (neighbours >= 0) & (neighbours != queries)
+        pairs = np.unique(np.sort(np.stack([queries[hits], neighbours[hits]], axis=1), axis=1), axis=0)
+        rows, cols = pairs[:, 0], pairs[:, 1]
+        pair_scores = np.einsum("ij,ij->i", vectors[rows], vectors[cols])
+        
+        order = np.argsort(-pair_scores, kind="stable")
+        similar_pairs = list(zip(rows[order].tolist(), cols[order].tolist(), pair_scores[order].tolist()))
         
-        # Compute cosine similarities
-        similarity_matrix = util.cos_sim(embeddings, embeddings)
+        logger.info("Found %d similar document pairs above threshold %.2f (ANN)", len(similar_pairs), threshold)
+        return similar_pairs
+    
+    def _pairs_above_threshold(
+        self,
+        sim_matrix: np.ndarray,
+        threshold: float
+    ) -> List[Tuple[int, int, float]]:
+        """Index pairs (i < j) of a similarity matrix at or above threshold, most similar first."""
+        # Threshold first, then take indices of the hits in the upper triangle
+        # (avoids materializing all N^2/2 index pairs)
+        rows, cols = np.nonzero(np.triu(sim_matrix >= threshold, k=1))
+        scores = sim_matrix[rows, cols]
+        
+        # Sort by similarity (descending)
+        order = np.argsort(-scores, kind="stable")
+        similar_pairs = list(zip(rows[order].tolist(), cols[order].tolist(), scores[order].tolist()))
         
-        return similarity_matrix.cpu().numpy()
+        logger.info("Found %d similar document pairs above threshold %.2f", len(similar_pairs), threshold)
+        return similar_pairs
     
     def find_similar_documents(
         self, 
@@ -59,63 +273,54 @@ class SemanticAnalyzer:
             List of (doc1_id, doc2_id, similarity_score) tuples
         """
         doc_ids = list(texts.keys())
-        doc_texts = [texts[doc_id] for doc_id in doc_ids]
-        
-        if len(doc_texts) < 2:
-            return []
-        
-        # Compute similarity matrix
-        sim_matrix = self.compute_similarity_matrix(doc_texts)
+        similar_pairs = self._find_similar_pairs(list(texts.values()), threshold)
         
-        # Find similar pairs
-        similar_pairs = []
-        for i in range(len(doc_ids)):
-            for j in range(i + 1, len(doc_ids)):
-                similarity = sim_matrix[i, j]
-                if similarity >= threshold:
-                    similar_pairs.append((doc_ids[i], doc_ids[j], float(similarity)))
-        
-        # Sort by similarity (descending)
-        similar_pairs.sort(key=lambda x: x[2], reverse=True)
-        
-        logger.info("Found %d similar document pairs above threshold %.2f", len(similar_pairs), threshold)
-        return similar_pairs
+        return [(doc_ids[i], doc_ids[j], score) for i, j, score in similar_pairs]
     
-    def analyze_bidder_documents(
-        self, 
-        bidder_texts: Dict[str, Dict[str, str]]
+    def analyze_document_batch(
+        self,
+        doc_keys: List[Tuple[str, str]],
+        texts: List[str]
     ) -> Dict[str, any]:
         """
-        Analyze similarity across bidder submissions.
+        Analyze similarity across bidder submissions given as flat lists.
         
         Args:
-            bidder_texts: Nested dict {bidder_id: {doc_id: text}}
+            doc_keys: (bidder_id, doc_id) for each document
+            texts: Document texts, aligned with doc_keys
             
         Returns:
             Analysis results with similarity scores and suspicious patterns
         """
-        # Flatten all documents
-        all_docs = {}
-        for bidder_id, docs in bidder_texts.items():
-            for doc_id, text in docs.items():
-                all_docs[f"{bidder_id}:{doc_id}"] = text
-        
         # Find similar documents
-        similar_pairs = self.find_similar_documents(all_docs, threshold=0.7)
+        similar_pairs = self._find_similar_pairs(texts, threshold=0.7)
         
+        return self._summarize_cross_bidder(doc_keys, texts, similar_pairs)
+    
+    def _summarize_cross_bidder(
+        self,
+        doc_keys: List[Tuple[str, str]],
+        texts: List[str],
+        similar_pairs: List[Tuple[int, int, float]]
+    ) -> Dict[str, any]:
+        """Turn similar index pairs into the cross-bidder similarity report."""
         # Group by bidder pairs
         cross_bidder_similarity = []
-        for doc1, doc2, score in similar_pairs:
-            bidder1 = doc1.split(":")[0]
-            bidder2 = doc2.split(":")[0]
+        for i, j, score in similar_pairs:
+            bidder1, doc1 = doc_keys[i]
+            bidder2, doc2 = doc_keys[j]
             
             if bidder1 != bidder2:
+                # Identical texts share one embedding; report them as exact
+                # copies rather than as a float score just below 1
+                exact_match = texts[i] == texts[j]
                 cross_bidder_similarity.append({
                     "bidder1": bidder1,
                     "bidder2": bidder2,
-                    "document1": doc1,
-                    "document2": doc2,
-                    "similarity": score
+                    "document1": f"{bidder1}:{doc1}",
+                    "document2": f"{bidder2}:{doc2}",
+                    "similarity": 1.0 if exact_match else score,
+                    "exact_match": exact_match
                 })
         
         return {
@@ -123,3 +328,71 @@ class SemanticAnalyzer:
             "cross_bidder_similarities": cross_bidder_similarity,
             "high_risk_pairs": [p for p in cross_bidder_similarity if p["similarity"] > 0.85]
         }
+    
+    def analyze_bidder_documents(
+        self, 
+        bidder_texts: Dict[str, Dict[str, str]]
+    ) -> Dict[str, any]:
+        """
+        Analyze similarity across bidder submissions.
+        
+        Args:
+            bidder_texts: Nested dict {bidder_id: {doc_id: text}}
+            
+        Returns:
+            Analysis results with similarity scores and suspicious patterns
+        """
+        return self.analyze_document_batch(*self._flatten_bidder_texts(bidder_texts))
+    
+    def analyze_many_bidder_documents(
+        self,
+        bidder_text_sets: List[Dict[str, Dict[str, str]]],
+        batch_size: int = 128
+    ) -> List[Dict[str, any]]:
+        """
+        Analyze several independent sets of bidder submissions at once.
+        
+        Documents from every set are encoded together in large batches
+        (instead of one small batch per set), then each set is compared
+        only within itself.
+        
+        Args:
+            bidder_text_sets: List of nested dicts {bidder_id: {doc_id: text}}
+            batch_size: Number of texts per forward pass
+            
+        Returns:
+            One analysis result per set, as from analyze_bidder_documents
+        """
+        flattened = [self._flatten_bidder_texts(bidder_texts) for bidder_texts in bidder_text_sets]
+        all_texts = [text for _, texts in flattened for text in texts]
+        if not all_texts:
+            return [self._summarize_cross_bidder([], [], []) for _ in flattened]
+        
+        embeddings = self.encode_batch(all_texts, batch_size=batch_size)
+        
+        results = []
+        start = 0
+        for doc_keys, texts in flattened:
+            end = start + len(texts)
+            if len(texts) < 2:
+                similar_pairs = []
+            else:
+                similar_pairs = self._similar_pairs_from_embeddings(embeddings[start:end], threshold=0.7)
+            results.append(self._summarize_cross_bidder(doc_keys, texts, similar_pairs))
+            start = end
+        
+        return results
+    
+    def _flatten_bidder_texts(
+        self,
+        bidder_texts: Dict[str, Dict[str, str]]
+    ) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """Flatten {bidder_id: {doc_id: text}} into aligned (bidder_id, doc_id) keys and texts."""
+        doc_keys = []
+        texts = []
+        for bidder_id, docs in bidder_texts.items():
+            for doc_id, text in docs.items():
+                doc_keys.append((bidder_id, doc_id))
+                texts.append(text)
+        
+        return doc_keys, texts
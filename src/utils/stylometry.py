@@ -1,14 +1,17 @@
 """
-Stylometry Analysis using spaCy and scikit-learn
+Stylometry Analysis using spaCy and NumPy
 """
 import logging
+import re
 import numpy as np
-from typing import Dict
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import Dict, List, Optional
+
+from .text_dedup import deduplicate_texts
 
 # Try to import spaCy, but handle Python 3.14 incompatibility
 try:
     import spacy
+    from spacy.symbols import ADJ, NOUN, VERB
     SPACY_AVAILABLE = True
 except Exception:
     SPACY_AVAILABLE = False
@@ -16,75 +19,150 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+# Pipeline components whose output the features never read
+UNUSED_PIPES = ("ner", "lemmatizer")
+
+# Token attributes exported per Doc, in column order
+TOKEN_ATTRS = ["IS_PUNCT", "IS_STOP", "IS_SPACE", "POS", "LOWER", "LENGTH", "SENT_START"]
+
+# Tokenizers for the string-statistics path (no spaCy model needed)
+_WORD_RE = re.compile(r"\w+")
+_SENT_RE = re.compile(r"[.!?]+")
+
 
 class StylometryAnalyzer:
     """Analyzes writing style to detect potential authorship similarities"""
     
-    def __init__(self, spacy_model: str = "en_core_web_sm"):
+    def __init__(self, spacy_model: str = "en_core_web_sm", include_pos: bool = True):
         """
         Initialize the stylometry analyzer.
         
         Args:
             spacy_model: Name of the spaCy model to use
+            include_pos: Compute stopword/POS ratios with spaCy by default; when
+                False only regex string statistics are used and the model is
+                never loaded
         """
+        self.spacy_model = spacy_model
+        self.include_pos = include_pos
+        self._nlp = None
+        self._nlp_loaded = False
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use (None if unavailable)."""
+        if not self._nlp_loaded:
+            self._nlp_loaded = True
+            self._nlp = self._load_spacy_model()
+        return self._nlp
+    
+    def _load_spacy_model(self):
+        """Load the configured spaCy model, or return None if it is unavailable."""
         if not SPACY_AVAILABLE:
             logger.warning("spaCy is not available (Python 3.14 incompatibility). Using basic text analysis.")
-            self.nlp = None
-            return
+            return None
             
-        logger.info("Loading spaCy model: %s", spacy_model)
+        logger.info("Loading spaCy model: %s", self.spacy_model)
         try:
-            self.nlp = spacy.load(spacy_model)
+            return spacy.load(self.spacy_model)
         except OSError:
-            logger.warning("Model %s not found. Using basic analysis instead.", spacy_model)
-            self.nlp = None
+            logger.warning("Model %s not found. Using basic analysis instead.", self.spacy_model)
+            return None
     
-    def extract_stylometric_features(self, text: str) -> Dict[str, float]:
+    def extract_stylometric_features(self, text: str, include_pos: Optional[bool] = None) -> Dict[str, float]:
         """
         Extract stylometric features from text.
         
         Args:
             text: Input text to analyze
+            include_pos: Override the analyzer's include_pos setting
             
         Returns:
             Dictionary of stylometric features
         """
-        if self.nlp is None:
-            # Fallback basic analysis without spaCy
-            words = text.split()
-            sentences = text.split('.')
-            if not words:
-                return {}
-            return {
-                "avg_word_length": sum(len(w) for w in words) / len(words),
-                "avg_sentence_length": len(words) / max(1, len(sentences)),
-                "lexical_diversity": len(set(words)) / len(words),
-                "punct_frequency": sum(1 for c in text if c in '.,!?;:') / max(1, len(text)),
-                "stopword_frequency": 0.0,
-                "noun_frequency": 0.0,
-                "verb_frequency": 0.0,
-                "adj_frequency": 0.0,
-            }
+        nlp = self._pipeline(include_pos)
+        if nlp is None:
+            return self._basic_features(text)
         
-        doc = self.nlp(text)
+        return self._doc_features(nlp(text))
+    
+    def extract_stylometric_features_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        n_process: int = 1,
+        include_pos: Optional[bool] = None
+    ) -> List[Dict[str, float]]:
+        """
+        Extract stylometric features from many texts in one spaCy pipe.
         
-        # Basic statistics
-        total_tokens = len([token for token in doc if not token.is_space])
-        total_sentences = len(list(doc.sents))
+        Args:
+            texts: Input texts to analyze
+            batch_size: Number of texts per spaCy batch
+            n_process: Worker processes for spaCy (-1 for all cores); each
+                worker loads its own copy of the model, so this only pays
+                off for large corpora
+            include_pos: Override the analyzer's include_pos setting
+            
+        Returns:
+            List of feature dictionaries, aligned with texts
+        """
+        nlp = self._pipeline(include_pos)
+        if nlp is None:
+            return [self._basic_features(text) for text in texts]
+        
+        # The parser stays enabled: it provides the sentence boundaries
+        disable = [name for name in UNUSED_PIPES if name in nlp.pipe_names]
+        docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+        return [self._doc_features(doc) for doc in docs]
+    
+    def _pipeline(self, include_pos: Optional[bool]):
+        """spaCy pipeline to use, or None for the string-statistics path."""
+        if include_pos is None:
+            include_pos = self.include_pos
+        return self.nlp if include_pos else None
+    
+    def _basic_features(self, text: str) -> Dict[str, float]:
+        """String statistics only (no spaCy): the POS-based ratios are 0."""
+        words = _WORD_RE.findall(text)
+        if not words:
+            return {}
+        total_words = len(words)
+        total_sentences = len(_SENT_RE.findall(text)) or 1
+        return {
+            "avg_word_length": sum(map(len, words)) / total_words,
+            "avg_sentence_length": total_words / total_sentences,
+            "lexical_diversity": len(set(map(str.lower, words))) / total_words,
+            "punct_frequency": sum(map(text.count, ".,!?;:")) / len(text),
+            "stopword_frequency": 0.0,
+            "noun_frequency": 0.0,
+            "verb_frequency": 0.0,
+            "adj_frequency": 0.0,
+        }
+    
+    def _doc_features(self, doc) -> Dict[str, float]:
+        """Stylometric features of a processed spaCy Doc."""
+        # All token attributes in one (n_tokens x 7) uint64 array
+        is_punct, is_stop, is_space, pos, lower, length, sent_start = doc.to_array(TOKEN_ATTRS).T
         
+        total_tokens = int(np.count_nonzero(is_space == 0))
         if total_tokens == 0:
             return {}
         
+        words = is_punct == 0
+        word_count = int(np.count_nonzero(words))
+        total_sentences = int(np.count_nonzero(sent_start == 1))
+        
         # Calculate features
         features = {
-            "avg_word_length": np.mean([len(token.text) for token in doc if not token.is_punct]),
+            "avg_word_length": int(length[words].sum()) / word_count if word_count else 0.0,
             "avg_sentence_length": total_tokens / max(total_sentences, 1),
-            "lexical_diversity": len(set([token.text.lower() for token in doc])) / total_tokens,
-            "punct_frequency": len([token for token in doc if token.is_punct]) / total_tokens,
-            "stopword_frequency": len([token for token in doc if token.is_stop]) / total_tokens,
-            "noun_frequency": len([token for token in doc if token.pos_ == "NOUN"]) / total_tokens,
-            "verb_frequency": len([token for token in doc if token.pos_ == "VERB"]) / total_tokens,
-            "adj_frequency": len([token for token in doc if token.pos_ == "ADJ"]) / total_tokens,
+            "lexical_diversity": np.unique(lower).size / total_tokens,
+            "punct_frequency": int(np.count_nonzero(is_punct)) / total_tokens,
+            "stopword_frequency": int(np.count_nonzero(is_stop)) / total_tokens,
+            "noun_frequency": int(np.count_nonzero(pos == NOUN)) / total_tokens,
+            "verb_frequency": int(np.count_nonzero(pos == VERB)) / total_tokens,
+            "adj_frequency": int(np.count_nonzero(pos == ADJ)) / total_tokens,
         }
         
         return features
@@ -105,34 +183,41 @@ class StylometryAnalyzer:
         if len(texts) < 2:
             return {"error": "Need at least 2 documents to compare"}
         
-        # Extract features for each document
-        features = {}
-        for doc_id, text in texts.items():
-            features[doc_id] = self.extract_stylometric_features(text)
+        # Extract features once per distinct text
+        unique_texts, inverse = deduplicate_texts(list(texts.values()))
+        unique_features = self.extract_stylometric_features_batch(unique_texts)
+        features = {
+            doc_id: dict(unique_features[idx])
+            for doc_id, idx in zip(texts.keys(), inverse)
+        }
+        
+        # Imported here so loading this module (and the UI) doesn't pull in pandas
+        import pandas as pd
         
-        # Convert to feature vectors
+        # Convert to feature vectors (features missing for a document count as 0)
+        # (reindex keeps a row for documents with no features, which from_dict drops)
         doc_ids = list(features.keys())
-        feature_names = list(next(iter(features.values())).keys())
-        
-        feature_matrix = np.array([
-            [features[doc_id].get(fname, 0) for fname in feature_names]
-            for doc_id in doc_ids
-        ])
-        
-        # Compute similarity
-        similarity_matrix = cosine_similarity(feature_matrix)
-        
-        # Find similar pairs
-        similar_pairs = []
-        for i in range(len(doc_ids)):
-            for j in range(i + 1, len(doc_ids)):
-                similarity = similarity_matrix[i, j]
-                if similarity > 0.8:  # High similarity threshold
-                    similar_pairs.append({
-                        "doc1": doc_ids[i],
-                        "doc2": doc_ids[j],
-                        "similarity": float(similarity)
-                    })
+        feature_frame = pd.DataFrame.from_dict(features, orient="index").reindex(doc_ids).fillna(0.0)
+        feature_names = feature_frame.columns.tolist()
+        feature_matrix = feature_frame.to_numpy(dtype=np.float64)
+        
+        # Cosine similarity of the L2-normalized rows (all-zero rows stay zero)
+        norms = np.linalg.norm(feature_matrix, axis=1, keepdims=True)
+        normalized = feature_matrix / np.where(norms > 0, norms, 1.0)
+        similarity_matrix = normalized @ normalized.T
+        
+        # Find similar pairs (high similarity threshold) in the upper triangle
+        rows, cols = np.nonzero(np.triu(similarity_matrix > 0.8, k=1))
+        similar_pairs = [
+            {
+                "doc1": doc_ids[i],
+                "doc2": doc_ids[j],
+                # Identical texts are reported as exact copies
+                "similarity": 1.0 if inverse[i] == inverse[j] else similarity,
+                "exact_match": inverse[i] == inverse[j]
+            }
+            for i, j, similarity in zip(rows.tolist(), cols.tolist(), similarity_matrix[rows, cols].tolist())
+        ]
         
         return {
             "features": features,
@@ -0,0 +1,29 @@
+"""
+Helpers for skipping repeated work on identical texts
+"""
+from typing import List, Tuple
+
+
+def deduplicate_texts(texts: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Collapse identical texts so expensive per-text work runs once per unique text.
+    
+    Args:
+        texts: List of text documents (may contain duplicates)
+        
+    Returns:
+        Tuple of (unique_texts, inverse) where texts[i] == unique_texts[inverse[i]]
+    """
+    positions = {}
+    unique_texts = []
+    inverse = []
+    
+    for text in texts:
+        idx = positions.get(text)
+        if idx is None:
+            idx = len(unique_texts)
+            positions[text] = idx
+            unique_texts.append(text)
+        inverse.append(idx)
+    
+    return unique_texts, inverse
@@ -2,19 +2,29 @@
 Streamlit UI for BitShield Procurement Agent
 """
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+import numpy as np
+from collections import Counter
 from pathlib import Path
 import json
+import hashlib
+import os
+import shutil
+import tempfile
+import orjson
 import sys
+from typing import Optional
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.state import BidderInfo
+from src.state import AnalysisResult, BidderInfo
 from src.agents import run_analysis
-from config import UPLOADS_DIR
+from src.utils.graph_layout import (
+    JIT_LAYOUT_MIN_NODES,
+    NUMBA_AVAILABLE,
+    fruchterman_reingold_layout
+)
+from config import MIN_BIDDERS_FOR_COLLUSION, UPLOADS_DIR
 import logging
 
 # Configure logging
@@ -29,15 +39,259 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS. Re-sent on every full rerun: Streamlit drops elements a run
+# doesn't emit, so a once-per-session guard would lose the styles. st.html with
+# only a <style> tag goes to the event container and adds no layout block.
+CUSTOM_CSS = """
 <style>
     .risk-high { background-color: #ff4444; color: white; padding: 10px; border-radius: 5px; }
     .risk-medium { background-color: #ffaa00; color: white; padding: 10px; border-radius: 5px; }
     .risk-low { background-color: #44ff44; color: white; padding: 10px; border-radius: 5px; }
     .metric-card { background-color: #f0f2f6; padding: 20px; border-radius: 10px; margin: 10px 0; }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.html(CUSTOM_CSS)
+
+
+def _json_default(obj):
+    """Fallback for values orjson can't serialize natively."""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def to_json(data) -> str:
+    """Serialize analysis evidence for st.json using orjson."""
+    return orjson.dumps(
+        data,
+        default=_json_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    ).decode()
+
+
+class PartialAnalysisError(Exception):
+    """A run finished with an error in state; carries whatever did complete."""
+    
+    def __init__(self, result: AnalysisResult):
+        super().__init__(result.error)
+        self.result = result
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_run_analysis(tender_id: str, tender_description: str, bidders_tuple: tuple, docs_fingerprint: tuple) -> AnalysisResult:
+    """
+    Run the analysis once per distinct set of inputs.
+    
+    docs_fingerprint holds (path, sha256, size) for every uploaded document so
+    that re-uploading different content under the same filename misses the cache.
+    """
+    bidders = [
+        BidderInfo(
+            bidder_id=bidder_id,
+            name=name,
+            bid_amount=bid_amount,
+            documents=list(documents),
+            contact_info=dict(contact_info)
+        )
+        for bidder_id, name, bid_amount, documents, contact_info in bidders_tuple
+    ]
+    
+    # Collect all document paths
+    all_docs = []
+    for b in bidders:
+        all_docs.extend(b.documents)
+    
+    final_state = run_analysis(
+        tender_id=tender_id,
+        tender_description=tender_description,
+        bidders=bidders,
+        uploaded_documents=all_docs
+    )
+    result = AnalysisResult.from_state(final_state)
+    # Nodes record failures in state instead of raising; raise here so
+    # st.cache_data does not store the failed run (e.g. an LLM timeout),
+    # while the caller still gets the partial results to render
+    if result.error:
+        raise PartialAnalysisError(result)
+    return result
+
+
+def _edge_indices(graph_json: dict) -> tuple:
+    """
+    Node IDs and edge endpoint indices straight from node-link JSON.
+    
+    Returns:
+        (nodes, src, dst) with src/dst as int32 index arrays into nodes
+    """
+    nodes = [node["id"] for node in graph_json.get("nodes", [])]
+    # networkx < 3.6 writes edges under "links"
+    links = graph_json.get("edges", graph_json.get("links", []))
+    idx = {n: i for i, n in enumerate(nodes)}
+    src = np.fromiter((idx[link["source"]] for link in links), dtype=np.int32, count=len(links))
+    dst = np.fromiter((idx[link["target"]] for link in links), dtype=np.int32, count=len(links))
+    return nodes, src, dst
+
+
+@st.cache_resource(show_spinner=False)
+def _build_graph(graph_json_str: str) -> tuple:
+    """
+    Parse a node-link graph once and share it across reruns and sessions.
+    
+    Returns:
+        (nodes, src, dst, degree); the arrays are read-only since they are shared
+    """
+    nodes, src, dst = _edge_indices(json.loads(graph_json_str))
+    degree = np.bincount(np.concatenate([src, dst]), minlength=len(nodes))
+    for arr in (src, dst, degree):
+        arr.flags.writeable = False
+    return nodes, src, dst, degree
+
+
+@st.cache_data(show_spinner=False)
+def _layout(graph_json_str: str) -> dict:
+    """Spring layout for a node-link graph, memoized on its JSON."""
+    nodes, src, dst, _ = _build_graph(graph_json_str)
+    
+    if NUMBA_AVAILABLE and len(nodes) > JIT_LAYOUT_MIN_NODES:
+        coords = fruchterman_reingold_layout(src, dst, len(nodes), iterations=50, seed=42)
+        return {n: (float(x), float(y)) for n, (x, y) in zip(nodes, coords)}
+    
+    import networkx as nx
+    
+    G = nx.Graph()
+    G.add_nodes_from(range(len(nodes)))
+    G.add_edges_from(zip(src.tolist(), dst.tolist()))
+    # Small bidder graphs settle well before networkx's default 50 iterations
+    iterations = 30 if len(nodes) <= JIT_LAYOUT_MIN_NODES else 50
+    pos = nx.spring_layout(G, seed=42, iterations=iterations)
+    return {n: (float(pos[i][0]), float(pos[i][1])) for i, n in enumerate(nodes)}
+
+
+def _save_upload(file) -> tuple:
+    """
+    Write an uploaded PDF to UPLOADS_DIR unless identical content is already there.
+    
+    Returns:
+        (save_path, sha256 hex digest, size in bytes)
+    """
+    # Hash in 1 MiB chunks; unchanged uploads skip the write on reruns
+    h = hashlib.sha256()
+    for chunk in iter(lambda: file.read(1 << 20), b""):
+        h.update(chunk)
+    file.seek(0)
+    digest = h.hexdigest()
+    save_path = UPLOADS_DIR / f"{digest[:16]}_{file.name}"
+    if not save_path.exists():
+        # Write to a temp file and rename, so an interrupted write never
+        # leaves a truncated PDF under the final (digest-named) path
+        fd, tmp_path = tempfile.mkstemp(dir=UPLOADS_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(file, f, length=1 << 20)
+            os.replace(tmp_path, save_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return str(save_path), digest, file.size
+
+
+@st.fragment
+def bidder_inputs() -> Optional[list]:
+    """
+    Sidebar bidder grid and document uploads.
+    
+    Runs as a fragment so editing bidders only reruns this block, not the
+    whole page; the Analyze button's full rerun picks up the returned data.
+    Documents are matched to bidders by filename prefix, e.g. B1_proposal.pdf.
+    
+    Returns:
+        Bidder dicts, or None when the grid is invalid (errors are shown inline)
+    """
+    default_bidders = [
+        {
+            "bidder_id": f"B{i+1}",
+            "name": f"Company {chr(65+i)}",
+            "bid_amount": 100000.0 + (i * 5000),
+            "email": f"contact{i+1}@company{chr(65+i).lower()}.com",
+            "phone": f"+1-555-{1000+i}"
+        }
+        for i in range(3)
+    ]
+    
+    # Document upload
+    uploaded_files = st.file_uploader(
+        "Upload Documents (prefix filenames with the bidder ID, e.g. B1_proposal.pdf)",
+        type=['pdf'],
+        accept_multiple_files=True,
+        key="docs"
+    )
+    
+    rows = st.data_editor(
+        default_bidders,
+        num_rows="dynamic",
+        column_config={
+            "bidder_id": st.column_config.TextColumn("ID"),
+            "name": st.column_config.TextColumn("Name"),
+            "bid_amount": st.column_config.NumberColumn("Bid Amount ($)", min_value=0.0, step=1000.0),
+            "email": st.column_config.TextColumn("Email"),
+            "phone": st.column_config.TextColumn("Phone")
+        },
+        key="bidders"
+    )
+    
+    # Validate the grid; uploads are matched and bidders become graph nodes by ID
+    bidder_ids = [(row.get("bidder_id") or "").strip() for row in rows]
+    id_counts = Counter(bidder_id.lower() for bidder_id in bidder_ids if bidder_id)
+    errors = []
+    if len(rows) < MIN_BIDDERS_FOR_COLLUSION:
+        errors.append(f"Add at least {MIN_BIDDERS_FOR_COLLUSION} bidders.")
+    if not all(bidder_ids):
+        errors.append("Every bidder needs an ID.")
+    duplicates = sorted({bidder_id for bidder_id in bidder_ids if bidder_id and id_counts[bidder_id.lower()] > 1})
+    if duplicates:
+        errors.append(f"Bidder IDs must be unique (repeated: {', '.join(duplicates)}).")
+    for error in errors:
+        st.error(f"❌ {error}")
+    
+    # The Analyze button is outside this fragment, so rerun the whole page
+    # when validity changes to enable or disable it
+    valid = not errors
+    previously_valid = st.session_state.get("bidders_valid")
+    st.session_state.bidders_valid = valid
+    if previously_valid is not None and previously_valid != valid:
+        st.rerun()
+    if not valid:
+        return None
+    
+    bidders_data = []
+    for i, (bidder_id, row) in enumerate(zip(bidder_ids, rows)):
+        bidders_data.append({
+            "bidder_id": bidder_id,
+            "name": row.get("name") or f"Bidder {i+1}",
+            "bid_amount": float(row.get("bid_amount") or 0.0),
+            "documents": [],
+            "contact_info": {
+                "email": row.get("email") or "",
+                "phone": row.get("phone") or ""
+            },
+            "doc_fingerprints": []
+        })
+    
+    # Save uploaded files and attach them to the bidder named by their prefix
+    by_prefix = {f"{b['bidder_id']}_".lower(): b for b in bidders_data}
+    for file in uploaded_files or []:
+        bidder = next(
+            (b for prefix, b in by_prefix.items() if file.name.lower().startswith(prefix)),
+            None
+        )
+        if bidder is None:
+            st.warning(f"⚠️ {file.name} does not start with a bidder ID and was skipped.")
+            continue
+        fingerprint = _save_upload(file)
+        bidder["documents"].append(fingerprint[0])
+        bidder["doc_fingerprints"].append(fingerprint)
+    
+    return bidders_data
 
 
 def main():
@@ -66,54 +320,15 @@ def main():
         st.markdown("---")
         st.header("👥 Bidder Information")
         
-        num_bidders = st.number_input("Number of Bidders", min_value=2, max_value=10, value=3)
-        
-        bidders_data = []
-        for i in range(int(num_bidders)):
-            with st.expander(f"Bidder {i+1}"):
-                bidder_name = st.text_input(f"Name", value=f"Company {chr(65+i)}", key=f"name_{i}")
-                bid_amount = st.number_input(
-                    f"Bid Amount ($)", 
-                    min_value=0.0, 
-                    value=100000.0 + (i * 5000),
-                    step=1000.0,
-                    key=f"amount_{i}"
-                )
-                
-                # Contact information
-                email = st.text_input(f"Email", value=f"contact{i+1}@company{chr(65+i).lower()}.com", key=f"email_{i}")
-                phone = st.text_input(f"Phone", value=f"+1-555-{1000+i}", key=f"phone_{i}")
-                
-                # Document upload
-                uploaded_files = st.file_uploader(
-                    f"Upload Documents",
-                    type=['pdf'],
-                    accept_multiple_files=True,
-                    key=f"docs_{i}"
-                )
-                
-                # Save uploaded files
-                doc_paths = []
-                if uploaded_files:
-                    for file in uploaded_files:
-                        save_path = UPLOADS_DIR / f"bidder_{i}_{file.name}"
-                        with open(save_path, "wb") as f:
-                            f.write(file.getbuffer())
-                        doc_paths.append(str(save_path))
-                
-                bidders_data.append({
-                    "bidder_id": f"B{i+1}",
-                    "name": bidder_name,
-                    "bid_amount": bid_amount,
-                    "documents": doc_paths,
-                    "contact_info": {
-                        "email": email,
-                        "phone": phone
-                    }
-                })
+        bidders_data = bidder_inputs()
         
         st.markdown("---")
-        analyze_button = st.button("🔍 Analyze Tender", type="primary", use_container_width=True)
+        analyze_button = st.button(
+            "🔍 Analyze Tender",
+            type="primary",
+            use_container_width=True,
+            disabled=bidders_data is None
+        )
     
     # Main content area
     if analyze_button:
@@ -122,50 +337,55 @@ def main():
         else:
             with st.spinner("🔄 Running comprehensive analysis..."):
                 try:
-                    # Convert to BidderInfo objects
-                    bidders = [
-                        BidderInfo(
-                            bidder_id=b["bidder_id"],
-                            name=b["name"],
-                            bid_amount=b["bid_amount"],
-                            documents=b["documents"],
-                            contact_info=b["contact_info"]
+                    # Hashable snapshot of the inputs for the analysis cache
+                    bidders_tuple = tuple(
+                        (
+                            b["bidder_id"],
+                            b["name"],
+                            b["bid_amount"],
+                            tuple(b["documents"]),
+                            frozenset(b["contact_info"].items())
                         )
                         for b in bidders_data
-                    ]
-                    
-                    # Collect all document paths
-                    all_docs = []
-                    for b in bidders:
-                        all_docs.extend(b.documents)
+                    )
+                    docs_fingerprint = tuple(
+                        fp for b in bidders_data for fp in b["doc_fingerprints"]
+                    )
                     
-                    # Run analysis
-                    result = run_analysis(
-                        tender_id=tender_id,
-                        tender_description=tender_description,
-                        bidders=bidders,
-                        uploaded_documents=all_docs
+                    # Run analysis (cached on identical inputs)
+                    result = _cached_run_analysis(
+                        tender_id,
+                        tender_description,
+                        bidders_tuple,
+                        docs_fingerprint
                     )
                     
                     st.session_state.analysis_result = result
                     st.success("✅ Analysis complete!")
                 
+                except PartialAnalysisError as e:
+                    st.session_state.analysis_result = e.result
+                    logger.warning("Analysis finished with an error: %s", e)
+                
                 except Exception as e:
                     st.error(f"❌ Error during analysis: {str(e)}")
-                    logger.error(f"Analysis error: {e}", exc_info=True)
+                    logger.error("Analysis error: %s", e, exc_info=True)
     
     # Display results
     if st.session_state.analysis_result:
         display_results(st.session_state.analysis_result)
 
 
-def display_results(result: dict):
+def display_results(result: AnalysisResult):
     """Display analysis results in a structured format"""
     
     st.markdown("## 📊 Analysis Results")
     
+    if result.error:
+        st.warning(f"⚠️ Analysis did not complete: {result.error}. Showing partial results.")
+    
     # Overall risk score
-    risk_score = result.get("overall_risk_score", 0)
+    risk_score = result.overall_risk_score
     risk_level = "HIGH" if risk_score > 0.7 else "MEDIUM" if risk_score > 0.4 else "LOW"
     risk_color = "red" if risk_score > 0.7 else "orange" if risk_score > 0.4 else "green"
     
@@ -178,7 +398,7 @@ def display_results(result: dict):
         st.markdown(f"### Risk Level: :{risk_color}[{risk_level}]")
     
     with col3:
-        num_signals = len(result.get("risk_signals", []))
+        num_signals = len(result.risk_signals)
         st.metric("Risk Signals Detected", num_signals)
     
     st.markdown("---")
@@ -197,36 +417,40 @@ def display_results(result: dict):
         display_executive_summary(result)
     
     with tab2:
-        display_price_analysis(result.get("price_analysis"))
+        display_price_analysis(result.price_analysis)
     
     with tab3:
-        display_similarity_analysis(result.get("similarity_analysis"))
+        display_similarity_analysis(result.similarity_analysis)
     
     with tab4:
-        display_stylometry_analysis(result.get("stylometry_analysis"))
+        display_stylometry_analysis(result.stylometry_analysis)
     
     with tab5:
-        display_relationship_graph(result.get("relationship_graph"))
+        display_relationship_graph(result.relationship_graph)
     
     with tab6:
-        display_risk_signals(result.get("risk_signals", []))
+        display_risk_signals(result.risk_signals)
 
 
-def display_executive_summary(result: dict):
+@st.fragment
+def display_executive_summary(result: AnalysisResult):
     """Display AI-generated executive summary"""
     st.subheader("AI-Generated Report")
     
-    messages = result.get("messages", [])
+    messages = result.messages
     
     # Find AI response
-    for msg in reversed(messages):
-        if hasattr(msg, 'content') and len(msg.content) > 100:
-            st.markdown(msg.content)
-            break
+    summary = next(
+        (m.content for m in reversed(messages) if len(getattr(m, "content", "")) > 100),
+        None
+    )
+    if summary:
+        st.markdown(summary)
     else:
         st.info("No executive summary generated.")
 
 
+@st.fragment
 def display_price_analysis(price_data: dict):
     """Display price analysis results"""
     if not price_data:
@@ -270,6 +494,7 @@ def display_price_analysis(price_data: dict):
             )
 
 
+@st.fragment
 def display_similarity_analysis(sim_data: dict):
     """Display document similarity analysis"""
     if not sim_data:
@@ -285,18 +510,20 @@ def display_similarity_analysis(sim_data: dict):
         
         for pair in high_risk:
             with st.expander(f"⚠️ {pair['bidder1']} ↔️ {pair['bidder2']} ({pair['similarity']:.1%} similar)"):
-                st.json(pair)
+                st.json(to_json(pair))
     else:
         st.success("No high-risk document similarities detected.")
     
     # All similarities
     all_sims = sim_data.get("cross_bidder_similarities", [])
     if all_sims:
+        import pyarrow as pa
+        
         st.markdown("### All Cross-Bidder Similarities")
-        df = pd.DataFrame(all_sims)
-        st.dataframe(df, use_container_width=True)
+        st.dataframe(pa.Table.from_pylist(all_sims), use_container_width=True)
 
 
+@st.fragment
 def display_stylometry_analysis(style_data: dict):
     """Display stylometry analysis"""
     if not style_data:
@@ -320,11 +547,21 @@ def display_stylometry_analysis(style_data: dict):
     # Feature comparison
     features = style_data.get("bidder_features", {})
     if features:
+        import pyarrow as pa
+        
         st.markdown("### Stylometric Features by Bidder")
-        df = pd.DataFrame(features).T
-        st.dataframe(df.round(3), use_container_width=True)
+        columns = dict.fromkeys(k for f in features.values() for k in f)
+        table = pa.Table.from_pydict({
+            "bidder": list(features),
+            **{
+                k: [round(features[b][k], 3) if k in features[b] else None for b in features]
+                for k in columns
+            }
+        })
+        st.dataframe(table, use_container_width=True)
 
 
+@st.fragment
 def display_relationship_graph(graph_data: dict):
     """Display relationship network visualization"""
     if not graph_data:
@@ -360,47 +597,45 @@ def display_relationship_graph(graph_data: dict):
     
     # Use graph data to create a simple visualization
     try:
-        import networkx as nx
-        from networkx.readwrite import json_graph
+        import plotly.graph_objects as go
         
         graph_json = graph_data.get("graph_data", {})
         if graph_json:
-            G = json_graph.node_link_graph(graph_json)
+            graph_json_str = json.dumps(graph_json, sort_keys=True)
+            nodes, src, dst, degree = _build_graph(graph_json_str)
             
             # Create plotly figure
-            pos = nx.spring_layout(G)
+            pos = _layout(graph_json_str)
+            
+            coords = np.array([pos[n] for n in nodes], dtype=float).reshape(-1, 2)
+            n_edges = len(src)
             
-            edge_x = []
-            edge_y = []
-            for edge in G.edges():
-                x0, y0 = pos[edge[0]]
-                x1, y1 = pos[edge[1]]
-                edge_x.extend([x0, x1, None])
-                edge_y.extend([y0, y1, None])
+            # x0, x1, gap per edge; Plotly breaks the line at NaN
+            edge_x = np.empty(3 * n_edges)
+            edge_y = np.empty(3 * n_edges)
+            edge_x[0::3], edge_x[1::3], edge_x[2::3] = coords[src, 0], coords[dst, 0], np.nan
+            edge_y[0::3], edge_y[1::3], edge_y[2::3] = coords[src, 1], coords[dst, 1], np.nan
             
-            edge_trace = go.Scatter(
+            # WebGL traces: one draw call each instead of an SVG element per point
+            edge_trace = go.Scattergl(
                 x=edge_x, y=edge_y,
                 line=dict(width=2, color='#888'),
                 hoverinfo='none',
                 mode='lines')
             
-            node_x = []
-            node_y = []
-            node_text = []
-            for node in G.nodes():
-                x, y = pos[node]
-                node_x.append(x)
-                node_y.append(y)
-                node_text.append(node)
+            node_x = coords[:, 0]
+            node_y = coords[:, 1]
+            node_text = nodes
             
-            node_trace = go.Scatter(
+            node_trace = go.Scattergl(
                 x=node_x, y=node_y,
                 mode='markers+text',
                 text=node_text,
+                hovertext=node_text,
                 textposition="top center",
                 hoverinfo='text',
                 marker=dict(
-                    size=20,
+                    size=8 + 3 * degree,
                     color='lightblue',
                     line=dict(width=2, color='darkblue')))
             
@@ -418,7 +653,8 @@ def display_relationship_graph(graph_data: dict):
         st.warning(f"Could not render network graph: {e}")
 
 
-def display_risk_signals(risk_signals: list):
+@st.fragment
+def display_risk_signals(risk_signals: tuple):
     """Display all risk signals"""
     if not risk_signals:
         st.success("✅ No risk signals detected. Tender appears clean.")
@@ -426,18 +662,16 @@ def display_risk_signals(risk_signals: list):
     
     st.subheader(f"Total Risk Signals: {len(risk_signals)}")
     
-    # Group by severity
-    high = [s for s in risk_signals if s.severity == "high"]
-    medium = [s for s in risk_signals if s.severity == "medium"]
-    low = [s for s in risk_signals if s.severity == "low"]
+    # Count by severity
+    counts = Counter(s.severity for s in risk_signals)
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("High Severity", len(high), delta=None, delta_color="inverse")
+        st.metric("High Severity", counts.get("high", 0), delta=None, delta_color="inverse")
     with col2:
-        st.metric("Medium Severity", len(medium))
+        st.metric("Medium Severity", counts.get("medium", 0))
     with col3:
-        st.metric("Low Severity", len(low))
+        st.metric("Low Severity", counts.get("low", 0))
     
     # Display each signal
     for signal in risk_signals:
@@ -448,7 +682,7 @@ def display_risk_signals(risk_signals: list):
             st.markdown(f"**Score:** {signal.score:.2f}")
             st.markdown(f"**Affected Bidders:** {', '.join(signal.affected_bidders)}")
             st.markdown("**Evidence:**")
-            st.json(signal.evidence)
+            st.json(to_json(signal.evidence))
 
 
 if __name__ == "__main__":